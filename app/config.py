@@ -2,31 +2,66 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from environs import Env
+import asyncio
 import json
 
+# Соединения пула сверх обработки апдейтов: лидерство (держит своё постоянно),
+# сброс FSM, outbox, правки статуса, задачи планировщика
+POOL_RESERVE = 6
+
 
 @dataclass(frozen=True)
 class Config:
     bot_token: str
-    general_chat_ids: list[int]
+    general_chat_ids: tuple[int, ...]
     threads_by_worktype: dict[str, int]
-    admins: set[int]
-    users: set[int] | None
+    admins: frozenset[int]
+    users: frozenset[int] | None
     db_dsn: str
     remind_every_min: int
+    remind_mode: str
+    remind_min_interval_min: int
+    remind_max_interval_min: int
+    live_edit_debounce_sec: float
+    send_rate_per_sec: float
+    send_concurrency: int
+    audit_every_min: int
+    audit_batch_size: int
+    audit_concurrency: int
+    audit_time_budget_sec: float
+    membership_verify_ttl_min: int
+    fsm_storage: str
+    fsm_cache_ttl_sec: float
+    fsm_idle_ttl_min: int
+    fsm_max_entries: int
+    leader_check_sec: float
+    update_concurrency: int
+    update_queue_max: int
+    db_pool_max: int
+    bot_mode: str
+    webhook_url: str
+    webhook_secret: str
+    webhook_host: str
+    webhook_port: int
+    webhook_path: str
 
 
-def load_config() -> Config:
-    env = Env();
-    env.read_env()
+def load_config(override: bool = False) -> Config:
+    """
+    Читает .env и окружение. Синхронный файловый I/O — вызывать только
+    на старте или через reload_config(), но не из обработчиков.
+    """
+    env = Env()
+    env.read_env(override=override)
 
-    def _int_list(s: str | None) -> list[int]:
-        return [int(x) for x in s.split(",") if x.strip()] if s else []
+    def _int_list(s: str | None) -> tuple[int, ...]:
+        return tuple(int(x) for x in s.split(",") if x.strip()) if s else ()
 
-    def _int_set(s: str | None) -> set[int]:
-        return set(_int_list(s))
+    def _int_set(s: str | None) -> frozenset[int]:
+        return frozenset(_int_list(s))
 
     threads = json.loads(env.str("THREADS_JSON", "{}"))
+    update_concurrency = env.int("UPDATE_CONCURRENCY", 16)
 
     return Config(
         bot_token=env.str("BOT_TOKEN"),
@@ -35,5 +70,56 @@ def load_config() -> Config:
         admins=_int_set(env.str("ADMINS", "")),
         users=_int_set(env.str("USERS", "")) or None,
         db_dsn=env.str("DB_DSN"),
-        remind_every_min=env.int("REMIND_EVERY_MIN", 2),
+        remind_every_min=env.int("REMIND_EVERY_MIN", 180),
+        remind_mode=env.str("REMIND_MODE", "digest"),
+        remind_min_interval_min=env.int("REMIND_MIN_INTERVAL_MIN", 30),
+        remind_max_interval_min=env.int("REMIND_MAX_INTERVAL_MIN", 720),
+        live_edit_debounce_sec=env.float("LIVE_EDIT_DEBOUNCE_SEC", 3),
+        send_rate_per_sec=env.float("SEND_RATE_PER_SEC", 30),
+        send_concurrency=env.int("SEND_CONCURRENCY", 8),
+        audit_every_min=env.int("AUDIT_EVERY_MIN", 60),
+        audit_batch_size=env.int("AUDIT_BATCH_SIZE", 200),
+        audit_concurrency=env.int("AUDIT_CONCURRENCY", 10),
+        audit_time_budget_sec=env.float("AUDIT_TIME_BUDGET_SEC", 40),
+        membership_verify_ttl_min=env.int("MEMBERSHIP_VERIFY_TTL_MIN", 30),
+        fsm_storage=env.str("FSM_STORAGE", "memory"),
+        fsm_cache_ttl_sec=env.float("FSM_CACHE_TTL_SEC", 30),
+        fsm_idle_ttl_min=env.int("FSM_IDLE_TTL_MIN", 60),
+        fsm_max_entries=env.int("FSM_MAX_ENTRIES", 10_000),
+        leader_check_sec=env.float("LEADER_CHECK_SEC", 5),
+        update_concurrency=update_concurrency,
+        update_queue_max=env.int("UPDATE_QUEUE_MAX", 1000),
+        db_pool_max=env.int("DB_POOL_MAX", update_concurrency + POOL_RESERVE),
+        bot_mode=env.str("BOT_MODE", "polling"),
+        webhook_url=env.str("WEBHOOK_URL", ""),
+        webhook_secret=env.str("WEBHOOK_SECRET", ""),
+        webhook_host=env.str("WEBHOOK_HOST", "0.0.0.0"),
+        webhook_port=env.int("WEBHOOK_PORT", 8080),
+        webhook_path=env.str("WEBHOOK_PATH", "/telegram/webhook"),
     )
+
+
+# ---------- снимок конфига на процесс ----------
+
+_config: Config | None = None
+
+
+def get_config() -> Config:
+    """
+    Текущий снимок конфига. С диска читается один раз, дальше — из памяти.
+    """
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
+
+
+async def reload_config() -> Config:
+    """
+    Перечитывает .env в отдельном потоке и атомарно подменяет снимок.
+    Действует на то, что читается из конфига на каждом апдейте/тике
+    (админы, чаты, темы); пул БД, токен и расписание — только после рестарта.
+    """
+    global _config
+    _config = await asyncio.to_thread(load_config, True)
+    return _config
@@ -0,0 +1,160 @@
+# app.db.leader
+from __future__ import annotations
+import asyncio
+import functools
+import logging
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from psycopg import AsyncConnection
+from psycopg_pool import AsyncConnectionPool
+
+# ключ сессионной advisory-блокировки лидера (миграции — 7_311_001)
+LEADER_LOCK_ID = 7_311_002
+
+_J = TypeVar("_J", bound=Callable[..., Awaitable[Any]])
+
+
+class LeaderElection:
+    """
+    Выбор одной реплики-лидера для фоновых задач планировщика.
+    Лидер держит сессионную pg_advisory_lock на соединении, взятом из пула
+    на всё время работы; остальные раз в interval пробуют pg_try_advisory_lock.
+    Умер лидер — Postgres закрывает его сессию и снимает блокировку,
+    следующая попытка другой реплики её получает. Лидер тем же интервалом
+    проверяет своё соединение: оборвалось — лидерство сразу снимается.
+    """
+
+    def __init__(
+        self,
+        pool: AsyncConnectionPool,
+        interval: float = 5.0,
+        lock_id: int = LEADER_LOCK_ID,
+    ) -> None:
+        self.pool = pool
+        self.interval = interval
+        self.lock_id = lock_id
+        self.replica = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self._conn: AsyncConnection | None = None
+        self._task: asyncio.Task | None = None
+
+        # метрики
+        self.leader_since: float | None = None
+        self.terms = 0
+        self.skipped_jobs = 0
+
+    # ---------- соединение ----------
+
+    async def _acquire_conn(self) -> AsyncConnection:
+        conn = await self.pool.getconn()
+        # сессионная блокировка не должна жить внутри транзакции
+        await conn.set_autocommit(True)
+        await conn.execute(
+            "SELECT set_config('application_name', %s, false)", (f"taskbot {self.replica}",)
+        )
+        return conn
+
+    async def _release_conn(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            if not conn.closed:
+                await conn.execute("SELECT pg_advisory_unlock_all()")
+                await conn.execute("RESET application_name")
+                await conn.set_autocommit(False)
+        except Exception:
+            logging.warning("leader: failed to reset connection before returning it to the pool")
+        await self.pool.putconn(conn)  # битое соединение пул выбросит сам
+
+    def _set_leader(self, value: bool) -> None:
+        if value == self.is_leader:
+            return
+        self.is_leader = value
+        if value:
+            self.terms += 1
+            self.leader_since = time.monotonic()
+            logging.info("leader: %s is now the scheduler leader", self.replica)
+        else:
+            self.leader_since = None
+            logging.warning("leader: %s lost scheduler leadership", self.replica)
+
+    # ---------- цикл ----------
+
+    async def _tick(self) -> None:
+        if self._conn is None:
+            self._conn = await self._acquire_conn()
+        if self.is_leader:
+            await self._conn.execute("SELECT 1")  # соединение живо — блокировка наша
+            return
+        cur = await self._conn.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_id,))
+        self._set_leader(bool((await cur.fetchone())[0]))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._set_leader(False)
+                logging.exception("leader: lock connection failed, retry in %.0fs", self.interval)
+                await self._release_conn()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="scheduler-leader")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # отдаём блокировку сразу, не дожидаясь закрытия соединения
+        self._set_leader(False)
+        await self._release_conn()
+
+    # ---------- задачи ----------
+
+    def gated(self, job: _J) -> _J:
+        """Обёртка задачи планировщика: выполняется только на лидере."""
+        @functools.wraps(job)
+        async def run(*args: Any, **kwargs: Any) -> Any:
+            if not self.is_leader:
+                self.skipped_jobs += 1
+                return None
+            return await job(*args, **kwargs)
+        return run  # type: ignore[return-value]
+
+    async def current_leader(self) -> str | None:
+        """application_name сессии, держащей блокировку лидера (по pg_locks)."""
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                """
+                SELECT a.application_name
+                FROM pg_locks l
+                JOIN pg_stat_activity a ON a.pid = l.pid
+                WHERE l.locktype = 'advisory' AND l.granted
+                  AND l.classid = 0 AND l.objid = %s AND l.objsubid = 1
+                """,
+                (self.lock_id,),
+            )
+            row = await cur.fetchone()
+        return row[0] if row else None
+
+    def stats(self) -> dict[str, Any]:
+        leader_for = round(time.monotonic() - self.leader_since) if self.leader_since else 0
+        return {
+            "replica": self.replica,
+            "is_leader": self.is_leader,
+            "leader_for_sec": leader_for,
+            "terms": self.terms,
+            "skipped_jobs": self.skipped_jobs,
+        }
@@ -0,0 +1,114 @@
+# app.db.migrate
+"""
+Версионные миграции: migrations/NNNN_name.sql применяются по порядку,
+факт применения и checksum пишутся в schema_migrations.
+Несколько реплик не мешают друг другу — применение идёт под advisory lock.
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from psycopg import AsyncConnection
+from psycopg.errors import UndefinedTable
+
+from .pool import get_pool
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+
+# произвольный, но постоянный ключ pg_advisory_xact_lock для миграций
+_LOCK_ID = 7_311_001
+
+_FILE_RE = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+    checksum: str
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    items: list[Migration] = []
+    for path in directory.glob("*.sql"):
+        m = _FILE_RE.match(path.name)
+        if not m:
+            raise RuntimeError(f"Bad migration file name: {path.name} (expected NNNN_name.sql)")
+        sql = path.read_text(encoding="utf-8")
+        items.append(Migration(
+            version=int(m.group(1)),
+            name=m.group(2),
+            sql=sql,
+            checksum=hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+        ))
+    items.sort(key=lambda x: x.version)
+    versions = [x.version for x in items]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return items
+
+
+async def _applied(conn: AsyncConnection) -> dict[int, str] | None:
+    """{version: checksum}; None — таблицы schema_migrations ещё нет."""
+    try:
+        cur = await conn.execute("SELECT version, checksum FROM schema_migrations")
+        return {int(v): c for v, c in await cur.fetchall()}
+    except UndefinedTable:
+        await conn.rollback()
+        return None
+
+
+def _pending(migrations: list[Migration], applied: dict[int, str]) -> list[Migration]:
+    for m in migrations:
+        if m.version in applied and applied[m.version] != m.checksum:
+            raise RuntimeError(
+                f"Migration {m.version:04d}_{m.name} was changed after it had been applied "
+                "(checksum mismatch)"
+            )
+    return [m for m in migrations if m.version not in applied]
+
+
+async def apply_migrations(migrations: list[Migration] | None = None) -> list[Migration]:
+    """
+    Применяет недостающие миграции, возвращает применённые.
+    На актуальной БД — один SELECT из schema_migrations.
+    """
+    migrations = discover() if migrations is None else migrations
+    pool = get_pool()
+    async with pool.connection() as conn:
+        applied = await _applied(conn)
+        if applied is not None and not _pending(migrations, applied):
+            return []
+
+        # медленный путь: под блокировкой, всё в одной транзакции
+        await conn.rollback()
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock(%s)", (_LOCK_ID,))
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version    integer PRIMARY KEY,
+                    name       text NOT NULL,
+                    checksum   text NOT NULL,
+                    applied_at timestamptz NOT NULL DEFAULT now()
+                )
+                """
+            )
+            # пока ждали блокировку, другая реплика могла всё применить
+            pending = _pending(migrations, await _applied(conn) or {})
+            for m in pending:
+                logging.info("Applying migration %04d_%s…", m.version, m.name)
+                try:
+                    # без параметров — несколько стейтментов за один execute
+                    await conn.execute(m.sql)
+                except Exception as e:
+                    raise RuntimeError(f"Migration {m.version:04d}_{m.name} failed") from e
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (m.version, m.name, m.checksum),
+                )
+        return pending
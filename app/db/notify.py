@@ -0,0 +1,70 @@
+# app.db.notify
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from psycopg import AsyncConnection, sql
+
+# payload уведомления; None — «соединение переподнято, уведомления могли потеряться,
+# перечитайте состояние целиком»
+NotifyHandler = Callable[[str | None], Awaitable[None]]
+
+
+class NotifyListener:
+    """
+    LISTEN на выделенном соединении (вне пула — оно занято всё время жизни
+    процесса). Уведомления раздаются подписчикам по каналам; при обрыве
+    соединение переподнимается, а подписчики получают None для полной перезагрузки.
+    """
+
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self._handlers: dict[str, list[NotifyHandler]] = {}
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, channel: str, handler: NotifyHandler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def _dispatch(self, channel: str, payload: str | None) -> None:
+        for handler in self._handlers.get(channel, []):
+            try:
+                await handler(payload)
+            except Exception:
+                logging.exception("notify: handler failed for channel=%s", channel)
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        first = True
+        while True:
+            try:
+                async with await AsyncConnection.connect(self.dsn, autocommit=True) as conn:
+                    for channel in self._handlers:
+                        await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                    logging.info("notify: listening on %s", ", ".join(self._handlers) or "—")
+                    if not first:
+                        for channel in self._handlers:
+                            await self._dispatch(channel, None)
+                    first = False
+                    backoff = 1.0
+                    async for n in conn.notifies():
+                        await self._dispatch(n.channel, n.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("notify: listener connection lost, reconnect in %.0fs", backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="pg-notify-listener")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -4,7 +4,7 @@ from psycopg_pool import AsyncConnectionPool
 _pool: AsyncConnectionPool | None = None
 
 
-async def init_pool(dsn: str) -> AsyncConnectionPool:
+async def init_pool(dsn: str, max_size: int = 10) -> AsyncConnectionPool:
     """
     Создаёт глобальный пул и явно ОТКРЫВАЕТ его.
     """
@@ -13,7 +13,7 @@ async def init_pool(dsn: str) -> AsyncConnectionPool:
         _pool = AsyncConnectionPool(
             conninfo=dsn,
             min_size=1,
-            max_size=10,
+            max_size=max_size,
             open=False,  # отложенное открытие
             kwargs={"autocommit": False}
         )
@@ -1,18 +1,33 @@
 # app.db.repo
 from __future__ import annotations
 from decimal import Decimal
-from typing import Any
 import logging
-from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Dict, NamedTuple, Optional
 
+from psycopg import AsyncConnection
 from psycopg.rows import dict_row
+from psycopg.types.json import Jsonb
 from .pool import get_pool
 
 
+@asynccontextmanager
+async def _connection(conn: AsyncConnection | None) -> AsyncIterator[AsyncConnection]:
+    """
+    Соединение для запроса: переданное (unit of work апдейта, см. app.db.uow)
+    или своё из пула — тогда коммит при выходе, как раньше.
+    """
+    if conn is not None:
+        yield conn
+    else:
+        async with get_pool().connection() as own:
+            yield own
+
+
 # ---------- users ----------
 
 async def upsert_user(user_id: int, username: str | None, full_name: str | None,
-                      is_admin: bool, is_member: bool) -> None:
+                      is_admin: bool, is_member: bool, conn: AsyncConnection | None = None) -> None:
     sql = """
     INSERT INTO users (id, username, full_name, is_admin, is_member)
     VALUES (%s, %s, %s, %s, %s)
@@ -22,19 +37,17 @@ async def upsert_user(user_id: int, username: str | None, full_name: str | None,
           is_admin = EXCLUDED.is_admin,
           is_member = EXCLUDED.is_member
     """
-    pool = get_pool()
-    async with pool.connection() as conn:
+    async with _connection(conn) as conn:
         async with conn.transaction():
             async with conn.cursor() as cur:
                 await cur.execute(sql, (user_id, username, full_name, is_admin, is_member))
 
 
-async def is_admin(user_id: int) -> bool:
+async def is_admin(user_id: int, conn: AsyncConnection | None = None) -> bool:
     sql = "SELECT is_admin FROM users WHERE id = %s"
-    pool = get_pool()
-    async with pool.connection() as conn:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
-            await cur.execute(sql, (user_id,))
+            await cur.execute(sql, (user_id,), prepare=True)
             row = await cur.fetchone()
             return bool(row[0]) if row else False
 
@@ -42,10 +55,9 @@ async def is_admin(user_id: int) -> bool:
 # ---------- assignments ----------
 
 
-async def disable_assignment(assignment_id: int) -> bool:
+async def disable_assignment(assignment_id: int, conn: AsyncConnection | None = None) -> bool:
     sql = "UPDATE assignments SET is_active = FALSE WHERE id = %s AND is_active = TRUE"
-    pool = get_pool()
-    async with pool.connection() as conn:
+    async with _connection(conn) as conn:
         async with conn.transaction():
             async with conn.cursor() as cur:
                 await cur.execute(sql, (assignment_id,))
@@ -54,25 +66,52 @@ async def disable_assignment(assignment_id: int) -> bool:
 
 # ---------- claims ----------
 
-async def take_claim(assignment_id: int, executor_id: int, volume: int) -> int | None:
-    free = await assignment_free_volume(assignment_id)
-    if volume <= 0 or volume > free:
-        return None
-
-    sql = "INSERT INTO task_claims (assignment_id, executor_id, volume) VALUES (%s, %s, %s) RETURNING id"
-    pool = get_pool()
-    async with pool.connection() as conn:
-        async with conn.transaction():
-            async with conn.cursor() as cur:
-                await cur.execute(sql, (assignment_id, executor_id, volume))
-                row = await cur.fetchone()
-                return int(row[0])
+class ClaimResult(NamedTuple):
+    claim_id: int | None  # id новой записи; None — взять не удалось
+    free: Decimal         # свободный объём на момент попытки
+
+
+# Захват объёма — одним атомарным запросом: строка задания блокируется
+# (FOR UPDATE возвращает её актуальную версию со свежим free_volume),
+# условный INSERT проходит, только если объёма хватает; счётчик
+# assignments.claimed_volume обновляет триггер на task_claims.
+_TAKE_CLAIM_SQL = """
+WITH a AS (
+    SELECT id, free_volume
+    FROM assignments
+    WHERE id = %(aid)s AND is_active = true
+    FOR UPDATE
+), ins AS (
+    INSERT INTO task_claims (assignment_id, executor_id, volume)
+    SELECT a.id, %(uid)s::bigint, %(vol)s::numeric
+    FROM a
+    WHERE %(vol)s::numeric > 0 AND %(vol)s::numeric <= a.free_volume
+    RETURNING id
+)
+SELECT (SELECT id FROM ins), (SELECT free_volume FROM a)
+"""
+
+
+async def take_claim(
+        assignment_id: int,
+        executor_id: int,
+        volume: int,
+        conn: AsyncConnection | None = None,
+) -> ClaimResult:
+    params = {"aid": assignment_id, "uid": executor_id, "vol": volume}
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_TAKE_CLAIM_SQL, params, prepare=True)
+            claim_id, free = await cur.fetchone()
+    return ClaimResult(
+        claim_id=int(claim_id) if claim_id is not None else None,
+        free=Decimal(free) if free is not None else Decimal("0"),
+    )
 
 
-async def admin_delete_assignment(assignment_id: int) -> bool:
+async def admin_delete_assignment(assignment_id: int, conn: AsyncConnection | None = None) -> bool:
     sql = "DELETE FROM assignments WHERE id = %s AND is_active = TRUE"
-    pool = get_pool()
-    async with pool.connection() as conn:
+    async with _connection(conn) as conn:
         async with conn.transaction():
             async with conn.cursor() as cur:
                 await cur.execute(sql, (assignment_id,))
@@ -80,19 +119,43 @@ async def admin_delete_assignment(assignment_id: int) -> bool:
 
 
 # 1) Список разрешённых пользователей (кэш на старте)
-async def list_member_user_ids() -> List[int]:
-    pool = get_pool()
-    async with pool.connection() as conn:
+_MEMBER_USER_IDS_SQL = "SELECT id FROM users WHERE is_member = true"
+
+
+async def list_member_user_ids(conn: AsyncConnection | None = None) -> List[int]:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
-            await cur.execute("SELECT id FROM users WHERE is_member = true")
+            await cur.execute(_MEMBER_USER_IDS_SQL)
             rows = await cur.fetchall()
             return [int(r[0]) for r in rows]
 
 
+# 1a) Членство одного пользователя (промах кэша allowed); None — пользователя нет
+_USER_IS_MEMBER_SQL = "SELECT is_member FROM users WHERE id = %s"
+
+
+async def user_is_member(user_id: int, conn: AsyncConnection | None = None) -> Optional[bool]:
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_USER_IS_MEMBER_SQL, (user_id,), prepare=True)
+            row = await cur.fetchone()
+            return bool(row[0]) if row else None
+
+
+# 1b) Профили всех пользователей (засев кэша регистрации)
+_USER_PROFILES_SQL = "SELECT id, username, full_name, is_admin, is_member FROM users"
+
+
+async def list_user_profiles(conn: AsyncConnection | None = None) -> List[Dict]:
+    async with _connection(conn) as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(_USER_PROFILES_SQL)
+            return await cur.fetchall()
+
+
 # Все user_id из таблицы users
-async def list_all_user_ids() -> list[int]:
-    pool = get_pool()
-    async with pool.connection() as conn:
+async def list_all_user_ids(conn: AsyncConnection | None = None) -> list[int]:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
             await cur.execute("SELECT id FROM users")
             rows = await cur.fetchall()
@@ -100,9 +163,12 @@ async def list_all_user_ids() -> list[int]:
 
 
 # 2) Обновить флаг членства
-async def set_user_membership(user_id: int, is_member: bool) -> None:
-    pool = get_pool()
-    async with pool.connection() as conn:
+async def set_user_membership(
+        user_id: int,
+        is_member: bool,
+        conn: AsyncConnection | None = None,
+) -> None:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
@@ -114,6 +180,69 @@ async def set_user_membership(user_id: int, is_member: bool) -> None:
             )
 
 
+# 2a) Очередной шард аудита: давно не проверенные (и ни разу) первыми, кроме админов.
+#     {user_id: is_member} в порядке давности проверки (индекс users_verified_at_idx).
+_STALE_MEMBERSHIPS_SQL = """
+SELECT id, is_member
+FROM users
+WHERE NOT (id = ANY(%s::bigint[]))
+ORDER BY verified_at ASC NULLS FIRST, id
+LIMIT %s
+"""
+
+
+async def stale_memberships(
+        limit: int,
+        exclude: List[int],
+        conn: AsyncConnection | None = None,
+) -> Dict[int, bool]:
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_STALE_MEMBERSHIPS_SQL, (exclude, limit), prepare=True)
+            return {int(r[0]): bool(r[1]) for r in await cur.fetchall()}
+
+
+# 2b) Админы из .env — всегда участники; id тех, кого пришлось исправить
+async def ensure_admin_membership(
+        admins: List[int],
+        conn: AsyncConnection | None = None,
+) -> List[int]:
+    if not admins:
+        return []
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "UPDATE users SET is_member = true"
+                " WHERE id = ANY(%s::bigint[]) AND NOT is_member RETURNING id",
+                (admins,),
+            )
+            return [int(r[0]) for r in await cur.fetchall()]
+
+
+# 2c) Результаты проверок аудита одним запросом: is_member и verified_at = now().
+#     NOTIFY users_membership_changed — только по строкам, где is_member изменился.
+async def save_membership_checks(
+        checks: Dict[int, bool],
+        conn: AsyncConnection | None = None,
+) -> int:
+    if not checks:
+        return 0
+    ids = list(checks.keys())
+    flags = [checks[i] for i in ids]
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                UPDATE users u
+                SET is_member = t.is_member, verified_at = now()
+                FROM unnest(%s::bigint[], %s::boolean[]) AS t(id, is_member)
+                WHERE u.id = t.id
+                """,
+                (ids, flags),
+            )
+            return cur.rowcount
+
+
 # 3) Апсертом сохраняем пользователя
 async def upsert_user_full(
         user_id: int,
@@ -121,9 +250,9 @@ async def upsert_user_full(
         full_name: Optional[str],
         is_admin: bool,
         is_member: bool,
+        conn: AsyncConnection | None = None,
 ) -> None:
-    pool = get_pool()
-    async with pool.connection() as conn:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
@@ -134,15 +263,20 @@ async def upsert_user_full(
                     full_name = EXCLUDED.full_name,
                     is_admin = EXCLUDED.is_admin,
                     is_member = EXCLUDED.is_member
+                WHERE (users.username, users.full_name, users.is_admin, users.is_member)
+                      IS DISTINCT FROM
+                      (EXCLUDED.username, EXCLUDED.full_name, EXCLUDED.is_admin, EXCLUDED.is_member)
                 """,
                 (user_id, username, full_name, is_admin, is_member),
             )
 
 
 # 4) Справочник заказчиков
-async def list_customers(active_only: bool = True) -> List[Dict]:
-    pool = get_pool()
-    async with pool.connection() as conn:
+async def list_customers(
+        active_only: bool = True,
+        conn: AsyncConnection | None = None,
+) -> List[Dict]:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
             if active_only:
                 await cur.execute("SELECT id, name FROM customers WHERE is_active = true ORDER BY name")
@@ -153,16 +287,27 @@ async def list_customers(active_only: bool = True) -> List[Dict]:
             return [dict(zip(cols, r)) for r in rows]
 
 
-async def get_customer_name(customer_id: int) -> Optional[str]:
-    pool = get_pool()
-    async with pool.connection() as conn:
+async def get_customer_name(customer_id: int, conn: AsyncConnection | None = None) -> Optional[str]:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
-            await cur.execute("SELECT name FROM customers WHERE id = %s", (customer_id,))
+            await cur.execute(
+                "SELECT name FROM customers WHERE id = %s", (customer_id,), prepare=True
+            )
             row = await cur.fetchone()
             return row[0] if row else None
 
 
 # 5) Создание задания (customer_id + snapshot)
+_CREATE_ASSIGNMENT_SQL = """
+INSERT INTO assignments
+    (author_id, work_type, deadline_at, project, customer_id, customer_name_snapshot,
+     total_volume, comment)
+VALUES
+    (%s, %s, %s, %s, %s, (SELECT name FROM customers WHERE id = %s), %s, %s)
+RETURNING id
+"""
+
+
 async def create_assignment(
         author_id: int,
         work_type: str,
@@ -171,28 +316,27 @@ async def create_assignment(
         customer_id: Optional[int],
         total_volume: Decimal,
         comment: Optional[str],
+        conn: AsyncConnection | None = None,
 ) -> int:
-    pool = get_pool()
-    async with pool.connection() as conn:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
             await cur.execute(
-                """
-                INSERT INTO assignments
-                    (author_id, work_type, deadline_at, project, customer_id, customer_name_snapshot, total_volume, comment)
-                VALUES
-                    (%s, %s, %s, %s, %s, (SELECT name FROM customers WHERE id = %s), %s, %s)
-                RETURNING id
-                """,
+                _CREATE_ASSIGNMENT_SQL,
                 (author_id, work_type, deadline_at, project, customer_id, customer_id, total_volume, comment),
+                prepare=True,
             )
             aid = await cur.fetchone()
             return int(aid[0])
 
 
 # 6) Помечаем опубликованным (чат/сообщение)
-async def mark_assignment_published(assignment_id: int, chat_id: int, message_id: int) -> None:
-    pool = get_pool()
-    async with pool.connection() as conn:
+async def mark_assignment_published(
+        assignment_id: int,
+        chat_id: int,
+        message_id: int,
+        conn: AsyncConnection | None = None,
+) -> None:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
             await cur.execute(
                 """
@@ -204,105 +348,354 @@ async def mark_assignment_published(assignment_id: int, chat_id: int, message_id
             )
 
 
-# 7) «Мои выданные задания» — имя заказчика стабильно
-async def my_assignments(author_id: int) -> List[Dict]:
-    pool = get_pool()
-    async with pool.connection() as conn:
+# 6a) Outbox публикаций: ставим в той же транзакции, что и create_assignment
+async def enqueue_publication(
+        assignment_id: int,
+        chat_id: int,
+        payload: Dict[str, Any],
+        conn: AsyncConnection | None = None,
+) -> None:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
             await cur.execute(
-                """
-                SELECT a.*,
-                       COALESCE(a.customer_name_snapshot, c.name) AS customer_name
-                FROM assignments a
-                LEFT JOIN customers c ON c.id = a.customer_id
-                WHERE a.author_id = %s
-                ORDER BY a.created_at DESC
-                LIMIT 50
-                """,
-                (author_id,),
+                "INSERT INTO publish_outbox (assignment_id, chat_id, payload) VALUES (%s, %s, %s)",
+                (assignment_id, chat_id, Jsonb(payload)),
             )
+
+
+_CLAIM_PUBLICATIONS_SQL = """
+UPDATE publish_outbox o
+SET next_attempt_at = now() + make_interval(secs => %s)
+FROM (
+    SELECT id
+    FROM publish_outbox
+    WHERE next_attempt_at <= now()
+    ORDER BY next_attempt_at, id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+) due
+WHERE o.id = due.id
+RETURNING o.id, o.assignment_id, o.chat_id, o.payload, o.attempts
+"""
+
+
+async def claim_publications(
+        limit: int,
+        lease_sec: float,
+        conn: AsyncConnection | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Берёт созревшие строки outbox в аренду: next_attempt_at сдвигается на lease_sec,
+    и до её конца другие воркеры строки не видят. Блокировки держатся только
+    на время этого запроса (строки, занятые параллельным claim, пропускаются);
+    если воркер упал, не отчитавшись, строки созреют снова по истечении аренды.
+    """
+    async with _connection(conn) as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(_CLAIM_PUBLICATIONS_SQL, (lease_sec, limit), prepare=True)
+            return await cur.fetchall()
+
+
+async def complete_publication(
+        outbox_id: int,
+        chat_id: int,
+        message_id: int,
+        conn: AsyncConnection | None = None,
+) -> None:
+    async with _connection(conn) as conn:
+        # payload сохраняем в задании — по нему сообщение перерисовывается при изменении объёма
+        await conn.execute(
+            """
+            UPDATE assignments a
+            SET published_chat_id = %s, published_message_id = %s, publish_payload = o.payload
+            FROM publish_outbox o
+            WHERE o.id = %s AND a.id = o.assignment_id
+            """,
+            (chat_id, message_id, outbox_id),
+        )
+        await conn.execute("DELETE FROM publish_outbox WHERE id = %s", (outbox_id,))
+
+
+async def fail_publication(
+        outbox_id: int,
+        error: str,
+        retry_in_sec: float | None,
+        conn: AsyncConnection | None = None,
+) -> None:
+    """retry_in_sec=None — больше не пытаться (строка остаётся для разбора)."""
+    async with _connection(conn) as conn:
+        await conn.execute(
+            """
+            UPDATE publish_outbox
+            SET attempts = attempts + 1,
+                last_error = %s,
+                next_attempt_at = COALESCE(now() + make_interval(secs => %s), 'infinity')
+            WHERE id = %s
+            """,
+            (error[:1000], retry_in_sec, outbox_id),
+        )
+
+
+# 7) «Мои выданные задания» — имя заказчика стабильно
+_MY_ASSIGNMENTS_SQL = """
+SELECT a.*,
+       COALESCE(a.customer_name_snapshot, c.name) AS customer_name
+FROM assignments a
+LEFT JOIN customers c ON c.id = a.customer_id
+WHERE a.author_id = %s
+ORDER BY a.created_at DESC
+LIMIT 50
+"""
+
+
+async def my_assignments(author_id: int, conn: AsyncConnection | None = None) -> List[Dict]:
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_MY_ASSIGNMENTS_SQL, (author_id,), prepare=True)
             rows = await cur.fetchall()
             cols = [d[0] for d in cur.description]
             return [dict(zip(cols, r)) for r in rows]
 
 
 # 8) (если используете) открытые задачи исполнителя
-async def my_open_claims(user_id: int) -> List[Dict]:
-    pool = get_pool()
-    async with pool.connection() as conn:
+_MY_OPEN_CLAIMS_SQL = """
+SELECT id, assignment_id, volume
+FROM task_claims
+WHERE executor_id=%s AND done=false
+ORDER BY created_at DESC
+"""
+
+
+async def my_open_claims(user_id: int, conn: AsyncConnection | None = None) -> List[Dict]:
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
-            await cur.execute(
-                """
-                SELECT id, assignment_id, volume
-                FROM task_claims
-                WHERE executor_id=%s AND done=false
-                ORDER BY created_at DESC
-                """,
-                (user_id,),
-            )
+            await cur.execute(_MY_OPEN_CLAIMS_SQL, (user_id,), prepare=True)
             rows = await cur.fetchall()
             cols = [d[0] for d in cur.description]
             return [dict(zip(cols, r)) for r in rows]
 
 
 # 9) (если используете) удалить мою незакрытую задачу
-async def delete_my_open_claim(claim_id: int, user_id: int) -> bool:
-    pool = get_pool()
-    async with pool.connection() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute(
-                """
-                DELETE FROM task_claims
-                WHERE id=%s AND executor_id=%s AND done=false
-                """,
-                (claim_id, user_id),
-            )
-            return cur.rowcount > 0
+_DELETE_MY_OPEN_CLAIM_SQL = """
+DELETE FROM task_claims
+WHERE id=%s AND executor_id=%s AND done=false
+RETURNING assignment_id
+"""
 
 
-# 10) (если используете) список свободных заданий для напоминаний
-async def list_free_assignments() -> List[Dict]:
-    pool = get_pool()
-    async with pool.connection() as conn:
+async def delete_my_open_claim(
+        claim_id: int,
+        user_id: int,
+        conn: AsyncConnection | None = None,
+) -> Optional[int]:
+    """id задания удалённой задачи; None — не найдена / чужая / уже выполнена."""
+    async with _connection(conn) as conn:
         async with conn.cursor() as cur:
-            await cur.execute(
-                """
-                SELECT a.id, a.work_type, a.published_chat_id
-                FROM assignments a
-                WHERE a.is_active = true
-                ORDER BY a.created_at DESC
-                LIMIT 100
-                """
-            )
+            await cur.execute(_DELETE_MY_OPEN_CLAIM_SQL, (claim_id, user_id))
+            row = await cur.fetchone()
+            return int(row[0]) if row else None
+
+
+# 9a) Текущее состояние опубликованных заданий — для правки сообщений в чате
+_PUBLISHED_STATES_SQL = """
+SELECT id, published_chat_id, published_message_id, publish_payload,
+       free_volume, is_active
+FROM assignments
+WHERE id = ANY(%s)
+  AND published_message_id IS NOT NULL
+  AND publish_payload IS NOT NULL
+"""
+
+
+async def published_assignment_states(
+        assignment_ids: List[int],
+        conn: AsyncConnection | None = None,
+) -> List[Dict[str, Any]]:
+    async with _connection(conn) as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(_PUBLISHED_STATES_SQL, (assignment_ids,))
+            return await cur.fetchall()
+
+
+# 10) Свободные задания для напоминаний — одним запросом:
+#     id, вид работ, чат публикации и свободный объём (тему даёт кэш ThreadBindings).
+#     Полностью разобранные и неопубликованные отсекаются в SQL
+#     (индекс assignments_open_free_idx).
+_FREE_ASSIGNMENTS_SQL = """
+SELECT a.id, a.work_type, a.published_chat_id, a.free_volume
+FROM assignments a
+WHERE a.is_active = true
+  AND a.free_volume > 0
+  AND a.published_chat_id IS NOT NULL
+ORDER BY a.created_at DESC
+LIMIT %s
+"""
+
+
+async def list_free_assignments(
+        limit: int = 100,
+        conn: AsyncConnection | None = None,
+) -> List[Dict]:
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_FREE_ASSIGNMENTS_SQL, (limit,), prepare=True)
             rows = await cur.fetchall()
             cols = [d[0] for d in cur.description]
             return [dict(zip(cols, r)) for r in rows]
 
 
-# 11) (если используете) расчёт свободного объёма
-async def assignment_free_volume(assignment_id: int) -> Decimal:
-    pool = get_pool()
-    async with pool.connection() as conn:
-        async with conn.cursor() as cur:
-            # всего
-            await cur.execute("SELECT total_volume FROM assignments WHERE id=%s", (assignment_id,))
-            row = await cur.fetchone()
-            total = Decimal(row[0]) if row else Decimal("0")
+# 10a) Дайджесты напоминаний: {(chat_id, thread_id): [message_id по порядку частей]}
+_REMINDER_DIGESTS_SQL = """
+SELECT chat_id, thread_id, message_id FROM reminder_digests ORDER BY chat_id, thread_id, part
+"""
+
 
-            # занято
+async def list_reminder_digests(
+        conn: AsyncConnection | None = None,
+) -> Dict[tuple[int, int], List[int]]:
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_REMINDER_DIGESTS_SQL)
+            result: Dict[tuple[int, int], List[int]] = {}
+            for chat_id, thread_id, message_id in await cur.fetchall():
+                result.setdefault((int(chat_id), int(thread_id)), []).append(int(message_id))
+            return result
+
+
+async def save_reminder_digest(
+        chat_id: int,
+        thread_id: int,
+        message_ids: List[int],
+        conn: AsyncConnection | None = None,
+) -> None:
+    """Заменяет сохранённые части дайджеста темы; пустой список — дайджеста больше нет."""
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
             await cur.execute(
-                "SELECT COALESCE(SUM(volume), 0) FROM task_claims WHERE assignment_id=%s AND done=false",
-                (assignment_id,),
+                "DELETE FROM reminder_digests WHERE chat_id = %s AND thread_id = %s",
+                (chat_id, thread_id),
             )
-            row2 = await cur.fetchone()
-            taken = Decimal(row2[0]) if row2 and row2[0] is not None else Decimal("0")
+            if message_ids:
+                await cur.execute(
+                    """
+                    INSERT INTO reminder_digests (chat_id, thread_id, part, message_id)
+                    SELECT %s, %s, t.part, t.message_id
+                    FROM unnest(%s::bigint[]) WITH ORDINALITY AS t(message_id, part)
+                    """,
+                    (chat_id, thread_id, message_ids),
+                )
+
+
+# 10b) Расписание напоминаний (REMIND_MODE=deadline).
+#      only_unscheduled=True — только ещё не запланированные (частичный индекс).
+_REMIND_SCHEDULE_SQL = """
+SELECT id, next_remind_at, deadline_at, remind_count
+FROM assignments
+WHERE is_active AND free_volume > 0 AND published_chat_id IS NOT NULL
+  AND (deadline_at IS NULL OR deadline_at > localtimestamp)
+"""
+_REMIND_UNSCHEDULED_SQL = _REMIND_SCHEDULE_SQL + "  AND next_remind_at IS NULL\n"
+
+
+async def list_reminder_schedule(
+        only_unscheduled: bool = False,
+        conn: AsyncConnection | None = None,
+) -> List[Dict[str, Any]]:
+    async with _connection(conn) as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(_REMIND_UNSCHEDULED_SQL if only_unscheduled else _REMIND_SCHEDULE_SQL)
+            return await cur.fetchall()
+
+
+_DUE_REMINDERS_SQL = """
+SELECT id, work_type, published_chat_id, free_volume,
+       deadline_at, remind_count, last_remind_free
+FROM assignments
+WHERE id = ANY(%s)
+  AND is_active AND free_volume > 0 AND published_chat_id IS NOT NULL
+"""
+
+
+async def due_reminders(
+        assignment_ids: List[int],
+        conn: AsyncConnection | None = None,
+) -> List[Dict[str, Any]]:
+    """Из подошедших по расписанию — те, что ещё открыты и не разобраны."""
+    async with _connection(conn) as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(_DUE_REMINDERS_SQL, (assignment_ids,))
+            return await cur.fetchall()
+
+
+_SAVE_REMIND_SCHEDULE_SQL = """
+UPDATE assignments a
+SET next_remind_at = t.at, remind_count = t.cnt, last_remind_free = t.free
+FROM unnest(%s::bigint[], %s::timestamptz[], %s::int[], %s::numeric[]) AS t(id, at, cnt, free)
+WHERE a.id = t.id
+"""
+
+
+async def save_reminder_schedule(
+        items: List[tuple[int, Any, int, Optional[Decimal]]],
+        conn: AsyncConnection | None = None,
+) -> None:
+    """
+    items: (assignment_id, next_remind_at | None, remind_count, last_remind_free) — одним UPDATE.
+    """
+    if not items:
+        return
+    ids, at, counts, free = (list(col) for col in zip(*items))
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_SAVE_REMIND_SCHEDULE_SQL, (ids, at, counts, free))
+
+
+# 11) Свободный объём — чтение поддерживаемого счётчика по первичному ключу
+_FREE_VOLUME_SQL = "SELECT free_volume FROM assignments WHERE id=%s"
 
-            return total - taken
 
+async def assignment_free_volume(
+        assignment_id: int,
+        conn: AsyncConnection | None = None,
+) -> Decimal:
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_FREE_VOLUME_SQL, (assignment_id,), prepare=True)
+            row = await cur.fetchone()
+            return Decimal(row[0]) if row else Decimal("0")
+
+
+# 11a) Сверка счётчика claimed_volume с task_claims; расхождения исправляются.
+#      Возвращает число исправленных заданий.
+_REBUILD_CLAIMED_VOLUME_SQL = """
+UPDATE assignments a
+SET claimed_volume = s.taken
+FROM (
+    SELECT a2.id, COALESCE(SUM(c.volume), 0) AS taken
+    FROM assignments a2
+    LEFT JOIN task_claims c ON c.assignment_id = a2.id AND c.done = false
+    GROUP BY a2.id
+) s
+WHERE s.id = a.id AND a.claimed_volume IS DISTINCT FROM s.taken
+"""
+
+
+async def rebuild_claimed_volume(conn: AsyncConnection | None = None) -> int:
+    async with _connection(conn) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_REBUILD_CLAIMED_VOLUME_SQL)
+            fixed = cur.rowcount
+    if fixed:
+        logging.warning("rebuild_claimed_volume: fixed %d assignments", fixed)
+    return fixed
 
-async def upsert_thread_binding(work_type: str, thread_id: int) -> None:
-    pool = get_pool()
-    async with pool.connection() as conn, conn.cursor() as cur:
+
+async def upsert_thread_binding(
+        work_type: str,
+        thread_id: int,
+        conn: AsyncConnection | None = None,
+) -> None:
+    async with _connection(conn) as conn, conn.cursor() as cur:
         await cur.execute(
             """
             insert into thread_bindings(work_type, thread_id)
@@ -312,16 +705,20 @@ async def upsert_thread_binding(work_type: str, thread_id: int) -> None:
             (work_type, thread_id),
         )
 
-async def thread_id_for_worktype(work_type: str) -> Optional[int]:
-    pool = get_pool()
-    async with pool.connection() as conn, conn.cursor() as cur:
-        await cur.execute("select thread_id from thread_bindings where work_type=%s", (work_type,))
+_THREAD_FOR_WORKTYPE_SQL = "select thread_id from thread_bindings where work_type=%s"
+
+
+async def thread_id_for_worktype(
+        work_type: str,
+        conn: AsyncConnection | None = None,
+) -> Optional[int]:
+    async with _connection(conn) as conn, conn.cursor() as cur:
+        await cur.execute(_THREAD_FOR_WORKTYPE_SQL, (work_type,), prepare=True)
         row = await cur.fetchone()
         return int(row[0]) if row else None
 
-async def list_thread_bindings() -> list[dict]:
-    pool = get_pool()
-    async with pool.connection() as conn, conn.cursor() as cur:
+async def list_thread_bindings(conn: AsyncConnection | None = None) -> list[dict]:
+    async with _connection(conn) as conn, conn.cursor() as cur:
         await cur.execute("select work_type, thread_id from thread_bindings order by work_type")
         rows = await cur.fetchall()
         cols = [d[0] for d in cur.description]
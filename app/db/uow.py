@@ -0,0 +1,92 @@
+# app.db.uow
+from __future__ import annotations
+import inspect
+import logging
+from contextvars import ContextVar
+from types import TracebackType
+from typing import Any, AsyncContextManager, Callable
+
+from psycopg import AsyncConnection
+from psycopg_pool import AsyncConnectionPool
+
+
+_current: ContextVar[UnitOfWork | None] = ContextVar("current_uow", default=None)
+
+
+def current_uow() -> UnitOfWork | None:
+    """UnitOfWork обрабатываемого апдейта (см. DbSessionMiddleware); None — вне апдейта."""
+    return _current.get()
+
+
+class UnitOfWork:
+    """
+    Одно соединение из пула на апдейт. Берётся лениво — при первом
+    connection(), так что апдейты без обращений к БД пул не трогают.
+    Всё, что сделано через это соединение, коммитится одним разом в close()
+    (или откатывается, если обработчик упал).
+    Действия, которым нужны уже видимые другим данные (правка сообщения в чате,
+    обновление кэшей), регистрируются через after_commit() и выполняются только
+    после успешного коммита; при откате — отбрасываются.
+    """
+
+    def __init__(self, pool: AsyncConnectionPool) -> None:
+        self._pool = pool
+        self._token = None
+        self._cm: AsyncContextManager[AsyncConnection] | None = None
+        self._conn: AsyncConnection | None = None
+        self._after_commit: list[Callable[[], Any]] = []
+
+    def bind(self) -> None:
+        """Сделать текущим для задачи апдейта — его соединением пользуется и FSM-хранилище."""
+        self._token = _current.set(self)
+
+    def unbind(self) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+    @property
+    def acquired(self) -> bool:
+        return self._conn is not None
+
+    async def connection(self) -> AsyncConnection:
+        if self._conn is None:
+            self._cm = self._pool.connection()
+            self._conn = await self._cm.__aenter__()
+        return self._conn
+
+    def after_commit(self, callback: Callable[[], Any]) -> None:
+        """Выполнить callback (обычный или async) после ближайшего успешного коммита."""
+        self._after_commit.append(callback)
+
+    async def _run_after_commit(self) -> None:
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logging.exception("uow: after-commit callback failed")
+
+    async def commit(self) -> None:
+        """Промежуточный коммит (например, перед долгим запросом в Telegram)."""
+        if self._conn is not None:
+            await self._conn.commit()
+        await self._run_after_commit()
+
+    async def close(self, exc: BaseException | None = None) -> None:
+        if self._cm is not None:
+            cm, self._cm, self._conn = self._cm, None, None
+            tb: TracebackType | None = exc.__traceback__ if exc else None
+            try:
+                # контекст пула: коммит без исключения, rollback — с ним;
+                # соединение возвращается в пул
+                await cm.__aexit__(type(exc) if exc else None, exc, tb)
+            except BaseException:
+                self._after_commit.clear()
+                raise
+        if exc is None:
+            await self._run_after_commit()
+        else:
+            self._after_commit.clear()
@@ -0,0 +1,169 @@
+# fsm/bounded_storage.py
+from __future__ import annotations
+import copy
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+
+def estimate_size(obj: Any, _seen: set[int] | None = None) -> int:
+    """Грубая оценка занимаемой памяти: sys.getsizeof по всему дереву контейнеров."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(x, seen) for x in obj)
+    return size
+
+
+@dataclass
+class _Record:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    touched: float = 0.0
+    size: int = 0
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """
+    MemoryStorage с ограничениями: запись, к которой не обращались idle_ttl
+    секунд, удаляется, а при превышении max_entries вытесняется самая давно
+    использованная (LRU). Записи лежат в OrderedDict в порядке обращения,
+    поэтому и TTL, и LRU снимаются с головы — без полного обхода.
+    Для вытесненных посреди сценария ключей остаётся «надгробие» —
+    consume_expired() по нему сообщает, что сценарий пользователя истёк.
+    """
+
+    MAX_TOMBSTONES = 10_000
+    TOMBSTONE_TTL = 24 * 3600
+
+    def __init__(
+        self,
+        idle_ttl: float = 3600,
+        max_entries: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._records: OrderedDict[StorageKey, _Record] = OrderedDict()
+        # key -> время вытеснения; только для ключей, у которых было состояние
+        self._tombstones: OrderedDict[StorageKey, float] = OrderedDict()
+        self._bytes = 0
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+        self.expired_notified = 0
+
+    # ---------- вытеснение ----------
+
+    def _drop(self, key: StorageKey, now: float) -> None:
+        record = self._records.pop(key)
+        self._bytes -= record.size
+        if record.state is not None:
+            self._tombstones[key] = now
+            self._tombstones.move_to_end(key)
+            while len(self._tombstones) > self.MAX_TOMBSTONES:
+                self._tombstones.popitem(last=False)
+
+    def sweep(self) -> None:
+        now = self.clock()
+        while self._records:
+            key, record = next(iter(self._records.items()))
+            if now - record.touched < self.idle_ttl:
+                break
+            self._drop(key, now)
+            self.evicted_ttl += 1
+        while len(self._records) > self.max_entries:
+            self._drop(next(iter(self._records)), now)
+            self.evicted_lru += 1
+        while self._tombstones:
+            key, at = next(iter(self._tombstones.items()))
+            if now - at < self.TOMBSTONE_TTL:
+                break
+            del self._tombstones[key]
+
+    def _get(self, key: StorageKey) -> _Record | None:
+        self.sweep()
+        record = self._records.get(key)
+        if record is not None:
+            record.touched = self.clock()
+            self._records.move_to_end(key)
+        return record
+
+    def _put(self, key: StorageKey) -> _Record:
+        record = self._get(key)
+        if record is None:
+            record = _Record(touched=self.clock())
+            self._records[key] = record
+        self._tombstones.pop(key, None)
+        return record
+
+    def _resize(self, record: _Record) -> None:
+        size = estimate_size(record.state) + estimate_size(record.data)
+        self._bytes += size - record.size
+        record.size = size
+
+    def _discard_if_empty(self, key: StorageKey, record: _Record) -> None:
+        # пустая запись ничего не хранит — не держим её и не считаем в лимите
+        if record.state is None and not record.data:
+            self._records.pop(key, None)
+            self._bytes -= record.size
+        elif len(self._records) > self.max_entries:
+            self.sweep()
+
+    # ---------- BaseStorage ----------
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._put(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._resize(record)
+        self._discard_if_empty(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = self._put(key)
+        record.data = copy.copy(dict(data))
+        self._resize(record)
+        self._discard_if_empty(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get(key)
+        return copy.copy(record.data) if record else {}
+
+    async def close(self) -> None:
+        pass
+
+    # ---------- истёкшие сценарии / метрики ----------
+
+    def consume_expired(self, key: StorageKey) -> bool:
+        """True один раз для ключа, чей незавершённый сценарий был вытеснен."""
+        if self._tombstones.pop(key, None) is None:
+            return False
+        self.expired_notified += 1
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        self.sweep()
+        return {
+            "entries": len(self._records),
+            "in_flow": sum(1 for r in self._records.values() if r.state is not None),
+            "bytes_est": self._bytes,
+            "max_entries": self.max_entries,
+            "idle_ttl_sec": self.idle_ttl,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_lru": self.evicted_lru,
+            "tombstones": len(self._tombstones),
+            "expired_notified": self.expired_notified,
+        }
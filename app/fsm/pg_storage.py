@@ -0,0 +1,253 @@
+# fsm/pg_storage.py
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from psycopg.types.json import Jsonb
+
+from ..db.pool import get_pool
+from ..db.uow import current_uow
+
+
+# канал инвалидации: payload «<origin>|<key>», origin — реплика, сделавшая запись
+FSM_CHANNEL = "fsm_storage_changed"
+
+
+def storage_key(key: StorageKey) -> str:
+    parts = [key.bot_id, key.chat_id, key.user_id, key.thread_id or "", key.destiny]
+    bc = getattr(key, "business_connection_id", None)
+    if bc:
+        parts.append(bc)
+    return ":".join(str(p) for p in parts)
+
+
+# В данных FSM лежат datetime (срок) и Decimal (объём) — JSON их не знает,
+# поэтому сохраняем с пометкой типа.
+def _encode(o: Any) -> Any:
+    if isinstance(o, Decimal):
+        return {"__decimal__": str(o)}
+    if isinstance(o, datetime):
+        return {"__datetime__": o.isoformat()}
+    if isinstance(o, date):
+        return {"__date__": o.isoformat()}
+    raise TypeError(f"FSM data value of type {type(o).__name__} is not serializable")
+
+
+def _decode(d: dict) -> Any:
+    if len(d) == 1:
+        if "__decimal__" in d:
+            return Decimal(d["__decimal__"])
+        if "__datetime__" in d:
+            return datetime.fromisoformat(d["__datetime__"])
+        if "__date__" in d:
+            return date.fromisoformat(d["__date__"])
+    return d
+
+
+def dumps(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=_encode, ensure_ascii=False)
+
+
+def loads(raw: str | None) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_decode) if raw else {}
+
+
+@dataclass
+class _Entry:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    loaded_at: float = 0.0
+    dirty: bool = False
+    # растёт на каждое изменение; сброс dirty — только если не менялась во время записи
+    version: int = 0
+
+
+class PgStorage(BaseStorage):
+    """
+    FSM-хранилище в Postgres (таблица fsm_storage) поверх общего пула.
+    Запись — write-behind: изменения копятся flush_interval секунд и уходят
+    одним пакетом, так что несколько update_data/set_state в одном апдейте
+    дают одну запись в БД. Грязные записи всегда читаются из кэша.
+    Чистые записи читаются из кэша процесса cache_ttl секунд. Межреплично кэш
+    согласуется через NOTIFY fsm_storage_changed: пакет записи в той же
+    транзакции уведомляет о каждом ключе, остальные реплики (on_notify) сбрасывают
+    свою чистую копию. Окно устаревания — flush_interval плюс доставка NOTIFY;
+    после переподключения слушателя сбрасывается весь чистый кэш.
+    """
+
+    def __init__(self, cache_ttl: float = 30.0, flush_interval: float = 0.2) -> None:
+        self.cache_ttl = cache_ttl
+        self.origin = uuid.uuid4().hex[:12]
+        # растёт на каждую инвалидацию: чтение, начатое до неё, в кэш как свежее не попадёт
+        self._generation = 0
+        self.flush_interval = flush_interval
+        self._cache: dict[str, _Entry] = {}
+        self._dirty: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self._closing = False
+
+    # ---------- чтение ----------
+
+    async def _entry(self, key: StorageKey) -> _Entry:
+        k = storage_key(key)
+        entry = self._cache.get(k)
+        if entry is not None and (entry.dirty or self._fresh(entry, time.monotonic())):
+            return entry
+
+        generation = self._generation
+        uow = current_uow()
+        if uow is not None:
+            # внутри апдейта — соединение его UoW: обработчик, уже держащий соединение,
+            # не ждёт второе из пула (при занятом пуле это взаимная блокировка)
+            row = await self._read(await uow.connection(), k)
+        else:
+            # FSMContextMiddleware читает состояние до DbSessionMiddleware —
+            # соединений апдейт ещё не держит
+            async with get_pool().connection() as conn:
+                row = await self._read(conn, k)
+
+        # пока ждали БД, запись могли изменить — локальные изменения важнее
+        entry = self._cache.get(k)
+        if entry is not None and entry.dirty:
+            return entry
+        entry = _Entry(state=row[0], data=loads(row[1])) if row else _Entry()
+        # пришла инвалидация, пока читали, — прочитанное могло устареть: следующее чтение — в БД
+        entry.loaded_at = time.monotonic() if generation == self._generation else float("-inf")
+        self._cache[k] = entry
+        return entry
+
+    async def on_notify(self, payload: str | None) -> None:
+        self._generation += 1
+        if not payload:
+            # слушатель переподключился — уведомления могли потеряться
+            self._cache = {k: e for k, e in self._cache.items() if e.dirty}
+            return
+        origin, _, k = payload.partition("|")
+        if origin == self.origin:
+            return
+        entry = self._cache.get(k)
+        # у грязной записи свои несброшенные изменения — они и уйдут в БД последними
+        if entry is not None and not entry.dirty:
+            del self._cache[k]
+
+    @staticmethod
+    async def _read(conn, k: str) -> tuple[Optional[str], Optional[str]] | None:
+        cur = await conn.execute(
+            "SELECT state, data::text FROM fsm_storage WHERE key = %s", (k,), prepare=True
+        )
+        return await cur.fetchone()
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._entry(key)).state
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict((await self._entry(key)).data)
+
+    # ---------- запись ----------
+
+    def _mark_dirty(self, key: StorageKey, entry: _Entry) -> None:
+        entry.dirty = True
+        entry.version += 1
+        self._dirty.add(storage_key(key))
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop(), name="fsm-pg-flusher")
+        self._wakeup.set()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(key, entry)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = await self._entry(key)
+        entry.data = dict(data)
+        self._mark_dirty(key, entry)
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        written: list[tuple[_Entry, int]] = []
+        upserts: list[tuple[str, Optional[str], Jsonb]] = []
+        deletes: list[str] = []
+        for k in keys:
+            entry = self._cache[k]
+            written.append((entry, entry.version))
+            if entry.state is None and not entry.data:
+                deletes.append(k)
+            else:
+                upserts.append((k, entry.state, Jsonb(entry.data, dumps=dumps)))
+        try:
+            async with get_pool().connection() as conn:
+                async with conn.cursor() as cur:
+                    if upserts:
+                        await cur.executemany(
+                            """
+                            INSERT INTO fsm_storage (key, state, data, updated_at)
+                            VALUES (%s, %s, %s, now())
+                            ON CONFLICT (key) DO UPDATE
+                            SET state = EXCLUDED.state, data = EXCLUDED.data, updated_at = now()
+                            """,
+                            upserts,
+                        )
+                    if deletes:
+                        await cur.execute("DELETE FROM fsm_storage WHERE key = ANY(%s)", (deletes,))
+                    # уведомления уходят при коммите — вместе с записью
+                    await cur.execute(
+                        f"SELECT pg_notify('{FSM_CHANNEL}', %s || '|' || k)"
+                        " FROM unnest(%s::text[]) AS k",
+                        (self.origin, list(keys)),
+                    )
+        except Exception:
+            # вернём в очередь: запись остаётся грязной и уйдёт следующим пакетом
+            self._dirty |= keys
+            raise
+        now = time.monotonic()
+        for entry, version in written:
+            # до коммита запись считалась грязной — чтение не могло подтянуть старую версию из БД
+            if entry.version == version:
+                entry.dirty = False
+                entry.loaded_at = now
+
+    def _fresh(self, entry: _Entry, now: float) -> bool:
+        return now - entry.loaded_at < self.cache_ttl
+
+    def _evict_clean(self) -> None:
+        now = time.monotonic()
+        stale = [k for k, e in self._cache.items() if not e.dirty and not self._fresh(e, now)]
+        for k in stale:
+            del self._cache[k]
+
+    async def _flush_loop(self) -> None:
+        while not self._closing:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # окно склейки: все записи за flush_interval — одним пакетом
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("PgStorage: flush failed, will retry")
+                self._wakeup.set()
+            self._evict_clean()
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
@@ -1,12 +1,12 @@
 # app/main.py
 import asyncio
+import signal
 import sys
 import logging
-from decimal import Decimal
-from pathlib import Path
-import re
+from datetime import timedelta
 
-from aiogram import Bot, Dispatcher
+from aiogram import Bot
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.default import DefaultBotProperties
@@ -14,99 +14,39 @@ from aiogram.enums import ParseMode
 from aiohttp import ClientConnectorError
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from .config import load_config
+from .config import POOL_RESERVE, get_config, reload_config
 from .db.pool import init_pool, get_pool, close_pool
 from .db import repo
+from .db.migrate import apply_migrations
+from .db.notify import NotifyListener
+from .db.leader import LeaderElection
+from .webhook import run_webhook
+from .fsm.pg_storage import FSM_CHANNEL, PgStorage
+from .fsm.bounded_storage import BoundedMemoryStorage
 
 from .routers import start as r_start
 from .routers import user_tasks as r_user
 from .routers import admin as r_admin
 from .routers import group as r_group
 from .routers import claims as r_claims
+from .routers import members as r_members
 
 from .middlewares.admin import AdminMiddleware
+from .middlewares.config import ConfigMiddleware
+from .middlewares.db import DbSessionMiddleware
+from .middlewares.fsm_expired import FlowExpiredMiddleware
 from .middlewares.members import AllMiddleware
 from .services.allowed import AllowedUsers
-
-CUSTOMERS_SEED = [
-    "Администрация Главы Чувашии",
-    "Глава Чувашии",
-    "Госпаблики",
-    "Госпаблики детских садов",
-    "Госпаблики ОМСУ",
-    "Госпаблики школ",
-    "Кабмин Чувашии",
-    "Медиацентр Чувашии",
-    "Минздрав Чувашии",
-    "Минкультуры Чувашии",
-    "Минобразования Чувашии",
-    "Минсельхоз Чувашии",
-    "Минспорт Чувашии",
-    "Минстрой Чувашии",
-    "Минтруд Чувашии",
-    "Минцифры Чувашии",
-    "Минэкономразвития Чувашии",
-    "Молодежная политика",
-    "Фонд защитников отечества",
-    "ЦУР Чувашии",
-    "Военкомат Чувашии",
-    "Госветслужба",
-    "Госпаблик Чебоксары",
-    "Госпаблики спортивных школ",
-    "Минтранс Чувашии",
-]
-
-# аккуратный сплит по ';' с учётом кавычек и $$...$$
-_SQL_SPLIT_RE = re.compile(r";\s*(?=(?:[^'\"$]|'[^']*'|\"[^\"]*\"|\$\$.*?\$\$)*$)", re.DOTALL)
-
-
-async def apply_schema():
-    """
-    1) Применяем schema.sql: бьём на стейтменты и выполняем по одному.
-    2) Проверяем, что таблица customers создана.
-    3) Если customers пуста — засеваем начальными значениями.
-    """
-    pool = get_pool()
-
-    # 1) читаем schema.sql
-    schema_path = Path(__file__).resolve().parent / "db" / "schema.sql"
-    if not schema_path.exists():
-        raise FileNotFoundError(f"schema.sql not found at: {schema_path}")
-    schema_sql = schema_path.read_text(encoding="utf-8")
-
-    # 2) разбиваем на отдельные запросы
-    statements = [s.strip() for s in _SQL_SPLIT_RE.split(schema_sql) if s.strip()]
-
-    async with pool.connection() as conn:
-        async with conn.transaction():
-            for i, stmt in enumerate(statements, 1):
-                try:
-                    await conn.execute(stmt)
-                except Exception as e:
-                    preview = (stmt.replace("\n", " ")[:220] + "…") if len(stmt) > 220 else stmt
-                    raise RuntimeError(f"Schema statement #{i} failed: {preview}") from e
-
-    # 3) sanity-check: существует ли таблица customers
-    async with pool.connection() as conn:
-        async with conn.transaction():
-            async with conn.cursor() as cur:
-                await cur.execute("select to_regclass('public.customers')")
-                exists = (await cur.fetchone())[0]
-                if not exists:
-                    raise RuntimeError("Table 'customers' was not created. Check schema.sql content.")
-
-    # 4) seed customers (если пусто)
-    async with pool.connection() as conn:
-        async with conn.transaction():
-            async with conn.cursor() as cur:
-                await cur.execute("select count(*) from customers")
-                count = (await cur.fetchone())[0]
-                if count == 0:
-                    for name in CUSTOMERS_SEED:
-                        await cur.execute(
-                            "insert into customers(name) values (%s) on conflict (name) do nothing",
-                            (name,),
-                        )
+from .services.customers import CustomerDirectory
+from .services.threads import ThreadBindings
+from .services.sender import SendScheduler
+from .services.lanes import UpdateLanes, LanedDispatcher
+from .services.outbox import OutboxDispatcher
+from .services.live_status import LiveStatusUpdater
+from .services.membership_audit import MembershipAuditor
+from .services.registration import RegistrationCache
+from .services.digest import ReminderDigests
+from .services.remind_scheduler import DeadlineReminders, RemindPolicy
 
 
 async def _probe_db() -> None:
@@ -115,95 +55,97 @@ async def _probe_db() -> None:
         await conn.execute("select 1")
 
 
-async def remind_job(bot: Bot):
+async def remind_job(bot: Bot, threads: ThreadBindings):
+    """
+    Напоминания о свободных заданиях: дайджестом по темам (REMIND_MODE=digest|digest_edit)
+    или по сообщению на задание (each).
+    """
+    mode = get_config().remind_mode
+    if mode in ("digest", "digest_edit"):
+        await ReminderDigests(edit=mode == "digest_edit").run(bot, threads)
+    else:
+        await _remind_each(bot, threads)
+
+
+async def _remind_each(bot: Bot, threads: ThreadBindings):
     from .services.publisher import assignment_markup
-    cfg = load_config()
+    # один запрос: свободный объём уже посчитан в SQL, тема — из кэша привязок
     ass = await repo.list_free_assignments()
+    if not ass:
+        return
     me = await bot.me()
-    for a in ass:
-        free = await repo.assignment_free_volume(a["id"])
-        if free <= Decimal("0") or not a["published_chat_id"]:
-            continue
-        # было:
-        # thread_id = cfg.threads_by_worktype.get(a["work_type"])
-        # стало:
-        thread_id = await repo.thread_id_for_worktype(a["work_type"])
-
-        text = f"🔔 Напоминание по заданию #{a['id']}: свободно {free}"
-        await bot.send_message(
-            a["published_chat_id"],
-            text,
-            message_thread_id=thread_id,
-            reply_markup=assignment_markup(a["id"], me.username),
-        )
+    # отправляем пачкой: темп задаёт SendScheduler в сессии бота
+    results = await asyncio.gather(
+        *(
+            bot.send_message(
+                a["published_chat_id"],
+                f"🔔 Напоминание по заданию #{a['id']}: свободно {a['free_volume']}",
+                message_thread_id=threads.get(a["work_type"]),
+                reply_markup=assignment_markup(a["id"], me.username),
+            )
+            for a in ass
+        ),
+        return_exceptions=True,
+    )
+    for a, res in zip(ass, results):
+        if isinstance(res, Exception):
+            logging.error("remind_job: failed to remind assignment #%s: %r", a["id"], res)
 
 
-async def audit_members_job(bot: Bot, allowed: AllowedUsers):
+async def audit_members_job(bot: Bot, allowed: AllowedUsers, auditor: MembershipAuditor):
     """
-    Раз в час сверяем users.is_member с фактом членства в общем чате из .env.
-    Админы всегда считаются членами. Кэш allowed перезагружается по итогам.
+    Сверяем users.is_member с фактом членства в общем чате из .env.
+    За тик проверяется очередной «шард» давно не проверенных пользователей
+    (см. MembershipAuditor), в БД и кэш allowed уходит только дифф.
     """
-    cfg = load_config()
+    cfg = get_config()
     # Берём единственный общий чат из env (как вы используете)
     if not cfg.general_chat_ids:
         logging.warning("audit_members_job: GENERAL_CHAT_IDS is empty; skip audit")
         return
     general_chat_id = int(cfg.general_chat_ids[0])
+    await auditor.run(bot, general_chat_id, cfg.admins, allowed)
 
-    try:
-        user_ids = await repo.list_all_user_ids()
-    except Exception:
-        logging.exception("audit_members_job: failed to list users")
-        return
-
-    # Сюда соберём всех, кого надо пустить в кэш allowed (is_member == True ИЛИ админ)
-    new_allowed_ids: list[int] = []
 
-    for uid in user_ids:
-        try:
-            # Админ — всегда член
-            if uid in cfg.admins:
-                await repo.set_user_membership(uid, True)
-                new_allowed_ids.append(uid)
-                continue
-
-            # Проверяем через Telegram API
-            try:
-                m = await bot.get_chat_member(general_chat_id, uid)
-                is_member = m.status in ("member", "administrator", "creator")
-            except Exception:
-                # Если Telegram вернул ошибку (например, бота нет в чате/пользователь ушёл)
-                is_member = False
-
-            await repo.set_user_membership(uid, is_member)
-            if is_member:
-                new_allowed_ids.append(uid)
+def _make_storage(cfg) -> BaseStorage:
+    if cfg.fsm_storage == "postgres":
+        return PgStorage(cache_ttl=cfg.fsm_cache_ttl_sec)
+    if cfg.fsm_storage == "bounded":
+        return BoundedMemoryStorage(
+            idle_ttl=cfg.fsm_idle_ttl_min * 60, max_entries=cfg.fsm_max_entries
+        )
+    if cfg.fsm_storage != "memory":
+        logging.warning("Unknown FSM_STORAGE=%r, falling back to memory", cfg.fsm_storage)
+    return MemoryStorage()
 
-        except Exception:
-            logging.exception("audit_members_job: error processing uid=%s", uid)
 
-    # Обновляем кэш allowed целиком
+async def _reload_config() -> None:
     try:
-        await allowed.load(new_allowed_ids)
-        logging.info("audit_members_job: allowed cache refreshed, %d users", len(new_allowed_ids))
+        cfg = await reload_config()
+        logging.info(
+            "Config reloaded: %d admins, %d general chats",
+            len(cfg.admins), len(cfg.general_chat_ids),
+        )
     except Exception:
-        logging.exception("audit_members_job: failed to refresh allowed cache")
+        logging.exception("Config reload failed; keeping previous snapshot")
 
 
 async def main():
     logging.info("Loading config…")
-    cfg = load_config()
+    cfg = get_config()
     tmask = (cfg.bot_token[:8] + "…") if getattr(cfg, "bot_token", None) else "<EMPTY>"
     logging.info("BOT_TOKEN looks like: %s", tmask)
 
     logging.info("Init DB pool…")
-    await init_pool(cfg.db_dsn)
+    await init_pool(cfg.db_dsn, max_size=cfg.db_pool_max)
 
     logging.info("Probing DB connectivity…")
     await _probe_db()
 
-    logging.info("Applying schema…")
-    await apply_schema()
+    logging.info("Applying migrations…")
+    applied = await apply_migrations()
+    names = ", ".join(f"{m.version:04d}_{m.name}" for m in applied)
+    logging.info("Migrations applied: %s", names or "none")
 
     # --- Allowed cache ---
     logging.info("Loading allowed members cache…")
@@ -216,23 +158,78 @@ async def main():
         logging.exception("Failed to load allowed members; continue with empty cache")
         await allowed.load([])
 
+    # проверенное членство и записанные профили — чтобы /start не ходил в Telegram и БД зря
+    registrations = RegistrationCache(ttl=cfg.membership_verify_ttl_min * 60)
+    try:
+        await registrations.load()
+    except Exception:
+        logging.exception("Failed to load registration cache; continue with empty cache")
+
+    # --- Customers / thread bindings caches + LISTEN/NOTIFY ---
+    logging.info("Loading customers and thread bindings caches…")
+    customers = CustomerDirectory()
+    await customers.load()
+    threads = ThreadBindings()
+    await threads.load()
+    listener = NotifyListener(cfg.db_dsn)
+    listener.subscribe("customers_changed", customers.on_notify)
+    listener.subscribe("thread_bindings_changed", threads.on_notify)
+    outbox = OutboxDispatcher(threads)
+    listener.subscribe("publish_outbox", outbox.on_notify)
+    listener.subscribe("users_membership_changed", allowed.on_notify)
+    listener.subscribe("users_membership_changed", registrations.on_notify)
+    storage = _make_storage(cfg)
+    if isinstance(storage, PgStorage):
+        # записи FSM с других реплик сбрасывают локальный кэш
+        listener.subscribe(FSM_CHANNEL, storage.on_notify)
+    listener.start()
+
+    # --- Scheduler leadership (advisory lock) ---
+    leader = LeaderElection(get_pool(), interval=cfg.leader_check_sec)
+    leader.start()
+
     # --- Bot / Dispatcher ---
     logging.info("Creating Bot/Dispatcher…")
     session = AiohttpSession()
+    sender = SendScheduler(global_rate=cfg.send_rate_per_sec, concurrency=cfg.send_concurrency)
+    session.middleware(sender)
     bot = Bot(
         cfg.bot_token,
         session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),  # aiogram 3.7+ так
     )
-    dp = Dispatcher(storage=MemoryStorage())
+    # storage.close() (сброс отложенных записей) Dispatcher вызывает на shutdown, до закрытия пула
+    # каждый апдейт в работе держит соединение своего UoW — дорожек не больше, чем свободных
+    # соединений пула, иначе апдейты ждут пул, а не семафор дорожек
+    concurrency = max(1, min(cfg.update_concurrency, cfg.db_pool_max - POOL_RESERVE))
+    if concurrency < cfg.update_concurrency:
+        logging.warning(
+            "UPDATE_CONCURRENCY=%d exceeds DB_POOL_MAX=%d minus %d reserved; using %d",
+            cfg.update_concurrency, cfg.db_pool_max, POOL_RESERVE, concurrency,
+        )
+    lanes = UpdateLanes(concurrency=concurrency, max_pending=cfg.update_queue_max)
+    dp = LanedDispatcher(storage=storage, lanes=lanes)
     dp["allowed"] = allowed
+    dp["registrations"] = registrations
+    dp["sender"] = sender
+    dp["lanes"] = lanes
+    dp["leader"] = leader
+    dp["outbox"] = outbox
+    dp["live"] = LiveStatusUpdater(debounce=cfg.live_edit_debounce_sec)
+    dp["customers"] = customers
+    dp["threads"] = threads
 
     # --- Middlewares ---
     try:
         logging.info("Attaching middlewares…")
-        dp.message.middleware(AllMiddleware(cfg.admins, allowed))
-        dp.callback_query.middleware(AllMiddleware(cfg.admins, allowed))
-        r_admin.router.message.middleware(AdminMiddleware(cfg.admins))
+        dp.update.outer_middleware(ConfigMiddleware())
+        dp.update.outer_middleware(DbSessionMiddleware())
+        if isinstance(dp.storage, BoundedMemoryStorage):
+            dp.message.outer_middleware(FlowExpiredMiddleware(dp.storage))
+            dp.callback_query.outer_middleware(FlowExpiredMiddleware(dp.storage))
+        dp.message.middleware(AllMiddleware(allowed))
+        dp.callback_query.middleware(AllMiddleware(allowed))
+        r_admin.router.message.middleware(AdminMiddleware())
         logging.info("Middlewares attached")
     except Exception:
         logging.exception("Middlewares setup failed")
@@ -245,6 +242,7 @@ async def main():
         ("admin", r_admin.router),
         ("group", r_group.router),
         ("claims", r_claims.router),
+        ("members", r_members.router),
     ]:
         try:
             logging.info("Including router: %s…", name)
@@ -266,16 +264,52 @@ async def main():
         logging.exception("Bot authorization failed (check BOT_TOKEN / network)")
         return
 
+    # --- Outbox публикаций (на каждой реплике, строки делятся через SKIP LOCKED) ---
+    outbox.start(bot)
+
     # --- Scheduler ---
+    # планировщик есть в каждой реплике, но задачи выполняет только лидер
     scheduler = AsyncIOScheduler(timezone="UTC")
-    scheduler.add_job(remind_job, "interval", minutes=cfg.remind_every_min, args=[bot])
-    scheduler.add_job(audit_members_job, "interval", minutes=1, args=[bot, allowed])  # аудит членства в чате
+    deadline_reminders: DeadlineReminders | None = None
+    if cfg.remind_mode == "deadline":
+        # своё расписание у каждого задания; работает только на лидере
+        deadline_reminders = DeadlineReminders(RemindPolicy(
+            min_interval=timedelta(minutes=cfg.remind_min_interval_min),
+            max_interval=timedelta(minutes=cfg.remind_max_interval_min),
+        ))
+        deadline_reminders.start(bot, threads, is_leader=lambda: leader.is_leader)
+    else:
+        scheduler.add_job(
+            leader.gated(remind_job), "interval", minutes=cfg.remind_every_min, args=[bot, threads]
+        )
+    auditor = MembershipAuditor(
+        batch_size=cfg.audit_batch_size,
+        concurrency=cfg.audit_concurrency,
+        time_budget=cfg.audit_time_budget_sec,
+        registrations=registrations,
+    )
+    scheduler.add_job(
+        leader.gated(audit_members_job), "interval", minutes=cfg.audit_every_min,
+        args=[bot, allowed, auditor], max_instances=1, coalesce=True,
+    )  # редкая сверка членства; основной источник — chat_member-апдейты
     scheduler.start()
-    logging.info("Scheduler started. Starting polling…")
+    logging.info("Scheduler started. Starting %s…", cfg.bot_mode)
+
+    # SIGHUP → перечитать .env и подменить снимок конфига
+    if not sys.platform.startswith("win"):
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(_reload_config()))
 
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
+        if cfg.bot_mode == "webhook":
+            await run_webhook(dp, bot, cfg)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            # chat_member Telegram присылает только по явному запросу в allowed_updates
+            # параллельность и порядок задаёт LanedDispatcher; опрос ждёт только места в очереди
+            await dp.start_polling(
+                bot, allowed_updates=dp.resolve_used_update_types(), handle_as_tasks=False,
+            )
     finally:
         logging.info("Shutting down…")
         try:
@@ -283,6 +317,23 @@ async def main():
                 scheduler.shutdown(wait=False)
         except Exception as e:
             logging.exception("Scheduler shutdown error: %s", e)
+        try:
+            await listener.stop()
+        except Exception as e:
+            logging.exception("Notify listener stop error: %s", e)
+        try:
+            if deadline_reminders is not None:
+                await deadline_reminders.stop()
+        except Exception as e:
+            logging.exception("Deadline reminders stop error: %s", e)
+        try:
+            await outbox.stop()
+        except Exception as e:
+            logging.exception("Outbox dispatcher stop error: %s", e)
+        try:
+            await leader.stop()
+        except Exception as e:
+            logging.exception("Leader election stop error: %s", e)
         try:
             await bot.session.close()
         except Exception as e:
@@ -5,12 +5,12 @@ from aiogram.types import Message
 
 
 class AdminMiddleware(BaseMiddleware):
-    def __init__(self, admins: set[int]) -> None:
-        self.admins = admins
-        super().__init__()
+    """
+    Список админов берётся из data["config"] (см. ConfigMiddleware).
+    """
 
     async def __call__(self, handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
                        event: Message, data: Dict[str, Any]) -> Any:
-        if event.from_user and event.from_user.id in self.admins:
+        if event.from_user and event.from_user.id in data["config"].admins:
             return await handler(event, data)
         return
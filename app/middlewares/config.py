@@ -0,0 +1,21 @@
+# app/middlewares/config.py
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from typing import Callable, Dict, Any, Awaitable
+from ..config import get_config
+
+
+class ConfigMiddleware(BaseMiddleware):
+    """
+    Кладёт в data["config"] текущий снимок конфига (без обращения к диску).
+    Снимок берётся на каждый апдейт, поэтому reload_config() подхватывается сразу.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["config"] = get_config()
+        return await handler(event, data)
@@ -0,0 +1,35 @@
+# app/middlewares/db.py
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from typing import Callable, Dict, Any, Awaitable
+from ..db.pool import get_pool
+from ..db.uow import UnitOfWork
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Unit of work на апдейт: кладёт в data["uow"] ленивый UnitOfWork.
+    Обработчик берёт соединение через `await uow.connection()` и передаёт
+    его в repo.*(conn=...) — одна выдача из пула и один коммит на апдейт.
+    UoW привязывается к задаче апдейта (current_uow), чтобы чтения PgStorage
+    из обработчика шли через то же соединение, а не занимали второе из пула.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        uow = UnitOfWork(get_pool())
+        data["uow"] = uow
+        uow.bind()
+        try:
+            result = await handler(event, data)
+        except BaseException as e:
+            await uow.close(e)
+            raise
+        finally:
+            uow.unbind()
+        await uow.close()
+        return result
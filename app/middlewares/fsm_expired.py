@@ -0,0 +1,42 @@
+# app/middlewares/fsm_expired.py
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject, Message, CallbackQuery
+from typing import Callable, Dict, Any, Awaitable
+from ..fsm.bounded_storage import BoundedMemoryStorage
+
+EXPIRED_TEXT = (
+    "⌛ Вы долго не отвечали, и незавершённый сценарий был сброшен. Начните заново из меню."
+)
+
+
+class FlowExpiredMiddleware(BaseMiddleware):
+    """
+    Если сценарий пользователя вытеснен из BoundedMemoryStorage, один раз
+    сообщает ему об этом. Апдейт обрабатывается дальше как обычно
+    (кнопки меню и команды работают без состояния).
+    Вешать как outer-мидлварь: ввод «в пустоту» не совпадёт ни с одним хэндлером.
+    """
+
+    def __init__(self, storage: BoundedMemoryStorage) -> None:
+        super().__init__()
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        state: FSMContext | None = data.get("state")
+        expired = (
+            state is not None
+            and data.get("raw_state") is None
+            and self.storage.consume_expired(state.key)
+        )
+        if expired:
+            if isinstance(event, Message) and event.chat.type == "private":
+                await event.answer(EXPIRED_TEXT)
+            elif isinstance(event, CallbackQuery) and event.message:
+                await event.message.answer(EXPIRED_TEXT)
+        return await handler(event, data)
@@ -8,11 +8,10 @@ from ..services.allowed import AllowedUsers
 class AllMiddleware(BaseMiddleware):
     """
     Пропускает: админов, пользователей из кэша, а также /start (для первичной проверки).
-    Никаких запросов к Telegram внутри мидлвари.
+    Никаких запросов к Telegram внутри мидлвари. Админы — из data["config"].
     """
-    def __init__(self, admins: set[int], allowed_cache: AllowedUsers) -> None:
+    def __init__(self, allowed_cache: AllowedUsers) -> None:
         super().__init__()
-        self.admins = admins
         self.allowed = allowed_cache
 
     async def __call__(
@@ -29,7 +28,7 @@ class AllMiddleware(BaseMiddleware):
         text = (event.text or "").strip() if event.text else ""
 
         # 1) админов всегда пропускаем
-        if uid in self.admins:
+        if uid in data["config"].admins:
             return await handler(event, data)
 
         # 2) /start всегда пропускаем (чтобы хэндлер мог добавить в БД и кэш)
@@ -1,9 +1,23 @@
 from __future__ import annotations
-from aiogram import Router, F
+import logging
+
+from aiogram import Router, F, html
 from aiogram.types import Message
 from aiogram.filters import Command
+from aiogram.fsm.storage.base import BaseStorage
 from ..middlewares.admin import AdminMiddleware
 from ..db import repo
+from ..db.uow import UnitOfWork
+from ..db.leader import LeaderElection
+from ..fsm.bounded_storage import BoundedMemoryStorage
+from ..services.sender import SendScheduler
+from ..services.lanes import UpdateLanes
+from ..services.outbox import OutboxDispatcher
+from ..services.live_status import LiveStatusUpdater
+from ..services.threads import ThreadBindings
+from ..services.allowed import AllowedUsers
+from ..services.registration import RegistrationCache
+from ..config import reload_config
 
 router = Router(name="admin")
 
@@ -14,9 +28,10 @@ async def admin_delete_prompt(message: Message):
 
 
 @router.message(F.chat.type == "private", F.text.regexp(r"^del\s+\d+$"))
-async def admin_delete_do(message: Message):
+async def admin_delete_do(message: Message, uow: UnitOfWork):
     assignment_id = int(message.text.split()[1])
-    ok = await repo.admin_delete_assignment(assignment_id)
+    ok = await repo.admin_delete_assignment(assignment_id, conn=await uow.connection())
+    await uow.commit()
     await message.answer("Удалено ✅" if ok else "Не найдено / уже закрыто.")
 
 
@@ -39,7 +54,7 @@ async def topic_id(message: Message):
 
 
 @router.message(Command("bind_worktype"))
-async def bind_worktype(message: Message):
+async def bind_worktype(message: Message, uow: UnitOfWork, threads: ThreadBindings):
     """
     Привязка work_type → thread_id. Использовать в нужной теме.
     Пример: /bind_worktype design|montage|shooting
@@ -53,15 +68,109 @@ async def bind_worktype(message: Message):
 
     work_type = parts[1]
     thread_id = message.message_thread_id
-    await repo.upsert_thread_binding(work_type, thread_id)
+    await repo.upsert_thread_binding(work_type, thread_id, conn=await uow.connection())
+    await uow.commit()
+    # локально — сразу; остальные реплики узнают по NOTIFY после коммита
+    threads.set(work_type, thread_id)
     await message.answer(f"Привязал <b>{work_type}</b> к теме с id=<code>{thread_id}</code>", parse_mode="HTML")
 
 
 @router.message(Command("show_threads"))
-async def show_threads(message: Message):
-    items = await repo.list_thread_bindings()
-    print(items)
+async def show_threads(message: Message, uow: UnitOfWork):
+    items = await repo.list_thread_bindings(conn=await uow.connection())
     if not items:
         return await message.answer("Привязок нет. Используйте /bind_worktype в нужных темах.")
     lines = [f"{it['work_type']}: <code>{it['thread_id']}</code>" for it in items]
     await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(F.chat.type == "private", Command("send_stats"))
+async def send_stats(
+    message: Message,
+    sender: SendScheduler,
+    outbox: OutboxDispatcher,
+    live: LiveStatusUpdater,
+):
+    """
+    Метрики исходящих сообщений: очередь, задержка, ретраи по 429,
+    публикации из outbox, правки статуса заданий.
+    """
+    lines = [f"{k}: <code>{v}</code>" for k, v in sender.stats().items()]
+    lines += [f"outbox_{k}: <code>{v}</code>" for k, v in outbox.stats().items()]
+    lines += [f"live_{k}: <code>{v}</code>" for k, v in live.stats().items()]
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(F.chat.type == "private", Command("lane_stats"))
+async def lane_stats(message: Message, lanes: UpdateLanes):
+    """
+    Метрики обработки апдейтов: очередь, дорожки, ожидание, обратное давление.
+    """
+    lines = [f"{k}: <code>{v}</code>" for k, v in lanes.stats().items()]
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(F.chat.type == "private", Command("leader"))
+async def leader_info(message: Message, leader: LeaderElection):
+    """
+    Какая реплика выполняет фоновые задачи и состояние этой реплики.
+    """
+    current = await leader.current_leader()
+    lines = [f"leader: <code>{current or '—'}</code>"]
+    lines += [f"{k}: <code>{v}</code>" for k, v in leader.stats().items()]
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(F.chat.type == "private", Command("fsm_stats"))
+async def fsm_stats(message: Message, fsm_storage: BaseStorage):
+    """
+    Состояние FSM-хранилища: записи, оценка памяти, вытеснения (для FSM_STORAGE=bounded).
+    """
+    if not isinstance(fsm_storage, BoundedMemoryStorage):
+        return await message.answer(
+            f"FSM-хранилище: <code>{type(fsm_storage).__name__}</code>, метрик нет.",
+            parse_mode="HTML",
+        )
+    lines = [f"{k}: <code>{v}</code>" for k, v in fsm_storage.stats().items()]
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(F.chat.type == "private", Command("member_stats"))
+async def member_stats(message: Message, allowed: AllowedUsers, registrations: RegistrationCache):
+    """
+    Кэши членства: снимок allowed и проверки/записи профиля в /start.
+    """
+    lines = [f"allowed_{k}: <code>{v}</code>" for k, v in allowed.stats().items()]
+    lines += [f"start_{k}: <code>{v}</code>" for k, v in registrations.stats().items()]
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(F.chat.type == "private", Command("reload_config"))
+async def reload_config_cmd(message: Message):
+    """
+    Перечитать .env без рестарта (то же, что SIGHUP процессу).
+    """
+    try:
+        cfg = await reload_config()
+    except Exception as e:
+        logging.exception("Config reload failed; keeping previous snapshot")
+        return await message.answer(
+            "Не удалось перечитать конфиг, оставлен прежний ❌\n"
+            f"<code>{html.quote(repr(e))}</code>",
+            parse_mode="HTML",
+        )
+    await message.answer(
+        f"Конфиг перечитан ✅ админов: {len(cfg.admins)}, тем: {len(cfg.threads_by_worktype)}"
+    )
+
+
+@router.message(F.chat.type == "private", Command("check_volumes"))
+async def check_volumes(message: Message, uow: UnitOfWork):
+    """
+    Сверить assignments.claimed_volume с task_claims и исправить расхождения.
+    """
+    fixed = await repo.rebuild_claimed_volume(conn=await uow.connection())
+    await uow.commit()
+    await message.answer(
+        "Счётчики объёма в порядке ✅" if not fixed else f"Исправлено заданий: {fixed}"
+    )
@@ -8,16 +8,25 @@ from aiogram.filters import StateFilter
 from aiogram.fsm.state import default_state
 
 from .user_tasks import _main_menu_for
+from ..config import Config
 from ..fsm.task_creation import ClaimTask
 from ..filters.validators import IsPositiveInt
 from ..db import repo
+from ..db.uow import UnitOfWork
 from ..keyboards.reply import claim_menu
+from ..services.live_status import LiveStatusUpdater
 
 router = Router(name="claims")
 
 # Шаг ввода объёма (валидное число по фильтру IsPositiveInt
 @router.message(ClaimTask.volume, IsPositiveInt())
-async def claim_set_volume(message: types.Message, state: FSMContext):
+async def claim_set_volume(
+    message: types.Message,
+    state: FSMContext,
+    config: Config,
+    uow: UnitOfWork,
+    live: LiveStatusUpdater,
+):
     vol = int(message.text.strip())  # гарантирует IsPositiveInt()
     data = await state.get_data()
     assignment_id = int(data.get("assignment_id") or 0)
@@ -25,20 +34,26 @@ async def claim_set_volume(message: types.Message, state: FSMContext):
         await state.clear()
         await message.answer(
             "Не удалось определить задание. Начните заново:",
-            reply_markup=_main_menu_for(message.from_user.id),
+            reply_markup=_main_menu_for(message.from_user.id, config),
         )
         return
 
-    new_id = await repo.take_claim(
+    res = await repo.take_claim(
         assignment_id=assignment_id,
         executor_id=message.from_user.id,
         volume=vol,
+        conn=await uow.connection(),
     )
+    if res.claim_id is not None:
+        # сообщение в чате обновится (с debounce) — только когда взятие уже закоммичено
+        uow.after_commit(lambda: live.touch(message.bot, assignment_id))
+    # отпускаем блокировку строки задания до ответов в Telegram (они идут через лимитер)
+    await uow.commit()
 
-    if new_id is None:
-        free = await repo.assignment_free_volume(assignment_id)
+    if res.claim_id is None:
+        # свободный объём уже посчитан в той же транзакции
         await message.answer(
-            f"Нельзя взять {vol}. Доступно сейчас: {free}. "
+            f"Нельзя взять {vol}. Доступно сейчас: {res.free}. "
             "Введите другое значение:",
             reply_markup=claim_menu(),
         )
@@ -48,16 +63,16 @@ async def claim_set_volume(message: types.Message, state: FSMContext):
     await state.clear()
     await message.answer(
         f"Готово! Вы взяли {vol} по заданию #{assignment_id} ✅",
-        reply_markup=_main_menu_for(message.from_user.id),
+        reply_markup=_main_menu_for(message.from_user.id, config),
     )
 
 # Отмена взятия объёма (при активной FSM)
 @router.message(~StateFilter(default_state), F.text == "❌ Отменить взятие")
-async def claim_cancel(message: types.Message, state: FSMContext):
+async def claim_cancel(message: types.Message, state: FSMContext, config: Config):
     await state.clear()
     await message.answer(
         "Операция отменена.",
-        reply_markup=_main_menu_for(message.from_user.id),
+        reply_markup=_main_menu_for(message.from_user.id, config),
     )
 
 # Фолбэк: ввели не число на шаге ввода объёма
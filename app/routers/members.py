@@ -0,0 +1,77 @@
+# app/routers/members.py
+from __future__ import annotations
+import logging
+
+from aiogram import Router
+from aiogram.types import ChatMemberUpdated
+
+from ..services.allowed import AllowedUsers
+from ..services.registration import RegistrationCache
+from ..config import Config
+from ..db import repo
+from ..db.uow import UnitOfWork
+
+router = Router(name="members")
+
+_MEMBER_STATUSES = ("member", "administrator", "creator")
+
+
+def _is_member(event: ChatMemberUpdated) -> bool:
+    m = event.new_chat_member
+    # restricted — всё ещё участник, если is_member=True
+    if m.status == "restricted":
+        return getattr(m, "is_member", False)
+    return m.status in _MEMBER_STATUSES
+
+
+@router.chat_member()
+async def general_chat_member_changed(
+    event: ChatMemberUpdated,
+    allowed: AllowedUsers,
+    config: Config,
+    uow: UnitOfWork,
+    registrations: RegistrationCache,
+):
+    """
+    Вступление/выход участников общего чата: сразу обновляем users.is_member
+    и кэши allowed/регистрации.
+    Приходит, только если бот — админ общего чата и chat_member есть в allowed_updates.
+    """
+    if event.chat.id not in config.general_chat_ids:
+        return
+
+    user = event.new_chat_member.user
+    if user.is_bot or user.id in config.admins:
+        # админы из .env — всегда члены
+        return
+
+    is_member = _is_member(event)
+    await repo.set_user_membership(user.id, is_member, conn=await uow.connection())
+    # кэши — только после коммита: при откате они не должны расходиться с users.is_member
+    if is_member:
+        uow.after_commit(lambda: allowed.add(user.id))
+        uow.after_commit(lambda: registrations.mark_verified(user.id))
+    else:
+        uow.after_commit(lambda: allowed.remove(user.id))
+        uow.after_commit(lambda: registrations.forget(user.id))
+    await uow.commit()
+    logging.info("chat_member: uid=%s is_member=%s", user.id, is_member)
+
+
+@router.my_chat_member()
+async def bot_status_changed(event: ChatMemberUpdated, config: Config):
+    """
+    Права самого бота в общем чате. Без админки chat_member-апдейты не приходят,
+    и членство держится только на фоновой сверке.
+    """
+    if event.chat.id not in config.general_chat_ids:
+        return
+    status = event.new_chat_member.status
+    if status != "administrator":
+        logging.warning(
+            "my_chat_member: bot is '%s' in general chat %s; chat_member updates are unavailable, "
+            "membership relies on the periodic audit",
+            status, event.chat.id,
+        )
+    else:
+        logging.info("my_chat_member: bot is administrator in general chat %s", event.chat.id)
@@ -7,17 +7,18 @@ from aiogram.filters import CommandStart, CommandObject
 from aiogram.fsm.context import FSMContext
 
 from ..services.allowed import AllowedUsers
+from ..services.registration import Profile, RegistrationCache
 from ..keyboards.reply import user_menu, admin_menu, claim_menu
-from ..config import load_config
+from ..config import Config
 from ..fsm.task_creation import ClaimTask
 from ..db import repo
+from ..db.uow import UnitOfWork
 
 router = Router(name="start")
 
 
-def _main_menu_for(user_id: int):
-    cfg = load_config()
-    return admin_menu() if user_id in cfg.admins else user_menu()
+def _main_menu_for(user_id: int, config: Config):
+    return admin_menu() if user_id in config.admins else user_menu()
 
 
 async def _is_member_of_chat(bot: Bot, chat_id: int, user_id: int) -> bool:
@@ -28,54 +29,76 @@ async def _is_member_of_chat(bot: Bot, chat_id: int, user_id: int) -> bool:
         return False
 
 
-async def _ensure_registered(message: Message, allowed: AllowedUsers) -> bool:
+async def _save_profile(
+    uid: int,
+    profile: Profile,
+    registrations: RegistrationCache,
+    uow: UnitOfWork,
+) -> None:
+    """Пишем в users, только если профиль отличается от последнего записанного."""
+    if not registrations.needs_upsert(uid, profile):
+        registrations.skipped += 1
+        return
+    await repo.upsert_user_full(
+        user_id=uid,
+        username=profile.username,
+        full_name=profile.full_name,
+        is_admin=profile.is_admin,
+        is_member=profile.is_member,
+        conn=await uow.connection(),
+    )
+    registrations.upserts += 1
+    # кэш узнаёт о профиле только после коммита: при откате следующий /start запишет снова
+    uow.after_commit(lambda: registrations.remember(uid, profile))
+    await uow.commit()  # строка users не должна ждать ответов в Telegram
+
+
+async def _ensure_registered(
+    message: Message,
+    allowed: AllowedUsers,
+    config: Config,
+    uow: UnitOfWork,
+    registrations: RegistrationCache,
+) -> bool:
     """
     Админ (из .env ADMINS) — всегда проходит.
     Обычный пользователь — регистрируем только если состоит в общем чате (из .env).
+    Членство, проверенное не раньше TTL назад, повторно у Telegram не спрашиваем;
+    неизменившийся профиль повторно не пишем.
     """
-    cfg = load_config()
     bot: Bot = message.bot
     uid = message.from_user.id
+    username, full_name = message.from_user.username, message.from_user.full_name
 
     # --- Админ: без проверки общего чата
-    if uid in cfg.admins:
-        await repo.upsert_user_full(
-            user_id=uid,
-            username=message.from_user.username,
-            full_name=message.from_user.full_name,
-            is_admin=True,
-            is_member=True,
-        )
-        if hasattr(allowed, "add"):
-            await allowed.add(uid)
+    if uid in config.admins:
+        await _save_profile(uid, Profile(username, full_name, True, True), registrations, uow)
+        await allowed.add(uid)
         return True
 
     # --- Обычный пользователь: проверяем членство в единственном общем чате из env
     # В конфиге general_chat_ids: list[int]; берём первый (единственный).
-    if not cfg.general_chat_ids:
+    if not config.general_chat_ids:
         await message.answer("Сервис недоступен: не задан GENERAL_CHAT_IDS в конфиге.")
         return False
 
-    general_chat_id = int(cfg.general_chat_ids[0])
-
-    is_member = await _is_member_of_chat(bot, general_chat_id, uid)
-    if not is_member:
-        await message.answer(
-            "Доступ только для участников общего чата.\n"
-            "Вступите в общий чат и затем отправьте /start в личку."
-        )
-        return False
-
-    # Состоит — регистрируем и кладём в кэш
-    await repo.upsert_user_full(
-        user_id=uid,
-        username=message.from_user.username,
-        full_name=message.from_user.full_name,
-        is_admin=False,
-        is_member=True,
-    )
-    if hasattr(allowed, "add"):
-        await allowed.add(uid)
+    general_chat_id = int(config.general_chat_ids[0])
+
+    # свежая проверка + is_member=true в БД (allowed) — Telegram не трогаем
+    if not (registrations.is_verified(uid) and await allowed.contains(uid)):
+        registrations.telegram_checks += 1
+        if not await _is_member_of_chat(bot, general_chat_id, uid):
+            registrations.forget(uid)
+            await message.answer(
+                "Доступ только для участников общего чата.\n"
+                "Вступите в общий чат и затем отправьте /start в личку."
+            )
+            return False
+        registrations.mark_verified(uid)
+
+    # Состоит — регистрируем (если что-то изменилось) и кладём в кэш
+    await _save_profile(uid, Profile(username, full_name, False, True), registrations, uow)
+    await allowed.add(uid)
     return True
 
 
@@ -86,9 +109,12 @@ async def start_with_deeplink(
     command: CommandObject,
     allowed: AllowedUsers,
     state: FSMContext,
+    config: Config,
+    uow: UnitOfWork,
+    registrations: RegistrationCache,
 ):
     uid = message.from_user.id
-    if not await _ensure_registered(message, allowed):
+    if not await _ensure_registered(message, allowed, config, uow, registrations):
         return
 
     arg = (command.args or "").strip()
@@ -108,7 +134,7 @@ async def start_with_deeplink(
     await state.clear()
     await message.answer(
         "Привет! Я помогу с заданиями. Выберите действие:",
-        reply_markup=_main_menu_for(uid),
+        reply_markup=_main_menu_for(uid, config),
     )
 
 
@@ -118,13 +144,16 @@ async def start_plain(
     message: Message,
     allowed: AllowedUsers,
     state: FSMContext,
+    config: Config,
+    uow: UnitOfWork,
+    registrations: RegistrationCache,
 ):
     uid = message.from_user.id
-    if not await _ensure_registered(message, allowed):
+    if not await _ensure_registered(message, allowed, config, uow, registrations):
         return
 
     await state.clear()
     await message.answer(
         "Добро пожаловать в TASKBOT!",
-        reply_markup=_main_menu_for(uid),
+        reply_markup=_main_menu_for(uid, config),
     )
@@ -11,10 +11,12 @@ from aiogram.types import CallbackQuery
 from ..fsm.task_creation import TaskCreation, DeleteClaim
 from ..filters.validators import IsDecimal, IsPositiveInt
 from ..db import repo
-from ..services.publisher import publish_assignment
-from ..config import load_config
+from ..db.uow import UnitOfWork
+from ..services.customers import CustomerDirectory
+from ..services.live_status import LiveStatusUpdater
+from ..config import Config
 from ..keyboards.reply import user_menu, admin_menu, task_creation_menu
-from ..keyboards.inline import worktype_keyboard, customers_keyboard
+from ..keyboards.inline import worktype_keyboard
 
 router = Router(name="user_tasks")
 
@@ -35,16 +37,17 @@ def _parse_datetime(s: str) -> Optional[datetime]:
             continue
     return None
 
-def _main_menu_for(user_id: int):
-    cfg = load_config()
-    return admin_menu() if user_id in cfg.admins else user_menu()
+def _main_menu_for(user_id: int, config: Config):
+    return admin_menu() if user_id in config.admins else user_menu()
 
 # --- flow ---
 
 @router.message(~StateFilter(default_state), F.chat.type == "private", F.text == "❌ Отмена задания")
-async def cancel(message: types.Message, state: FSMContext):
+async def cancel(message: types.Message, state: FSMContext, config: Config):
     await state.clear()
-    await message.answer("Создание задания прервано.", reply_markup=_main_menu_for(message.from_user.id))
+    await message.answer(
+        "Создание задания прервано.", reply_markup=_main_menu_for(message.from_user.id, config)
+    )
 
 @router.message(StateFilter(default_state), F.chat.type == "private", F.text == "📝 Выдать задание")
 async def start_task_creation(message: types.Message, state: FSMContext):
@@ -91,19 +94,18 @@ async def ask_project(message: types.Message, state: FSMContext):
 
 # выбор заказчика (inline из БД)
 @router.message(TaskCreation.project, F.text)
-async def ask_customer(message: types.Message, state: FSMContext):
+async def ask_customer(message: types.Message, state: FSMContext, customers: CustomerDirectory):
     await state.update_data(project=message.text.strip())
     await state.set_state(TaskCreation.customer)
-    customers = await repo.list_customers()
-    await message.answer("Выберите заказчика:", reply_markup=customers_keyboard(customers))
+    await message.answer("Выберите заказчика:", reply_markup=customers.keyboard)
 
 @router.callback_query(TaskCreation.customer, F.data.startswith("customer:"))
-async def select_customer(callback: CallbackQuery, state: FSMContext):
+async def select_customer(callback: CallbackQuery, state: FSMContext, customers: CustomerDirectory):
     customer_id = int(callback.data.split(":", 1)[1])
     await state.update_data(customer_id=customer_id)
     await state.set_state(TaskCreation.total_volume)
 
-    name = await repo.get_customer_name(customer_id)
+    name = customers.name(customer_id)
     await callback.message.edit_text(f"Вы выбрали заказчика: {name}")
 
     # подсказка для объёма зависит от work_type
@@ -134,20 +136,29 @@ async def ask_comment(message: types.Message, state: FSMContext):
 
 # финализация
 @router.message(TaskCreation.comment, F.text)
-async def finalize_task(message: types.Message, state: FSMContext):
+async def finalize_task(
+    message: types.Message,
+    state: FSMContext,
+    config: Config,
+    uow: UnitOfWork,
+    customers: CustomerDirectory,
+):
     comment = None if message.text.strip() == "-" else message.text.strip()
     data = await state.get_data()
-    cfg = load_config()
 
     # проверяем выбранного заказчика
     customer_id = data.get("customer_id")
     if customer_id is None:
-        customers = await repo.list_customers()
         await state.set_state(TaskCreation.customer)
-        await message.answer("Похоже, вы не выбрали заказчика. Выберите заказчика:", reply_markup=customers_keyboard(customers))
+        await message.answer(
+            "Похоже, вы не выбрали заказчика. Выберите заказчика:", reply_markup=customers.keyboard
+        )
         return
 
-    customer_name = await repo.get_customer_name(customer_id)
+    # одна транзакция: задание и строка outbox появляются вместе (коммит — до
+    # ответа пользователю), публикует фоновый OutboxDispatcher — Telegram здесь не ждём;
+    # имя заказчика — из кэша, отдельных запросов нет
+    conn = await uow.connection()
 
     # создаём задание в БД (snapshot имени заполняется на уровне SQL)
     a_id = await repo.create_assignment(
@@ -157,7 +168,8 @@ async def finalize_task(message: types.Message, state: FSMContext):
         project=data["project"],
         customer_id=customer_id,
         total_volume=data["total_volume"],
-        comment=comment
+        comment=comment,
+        conn=conn,
     )
 
     # ярлык объёма поверх work_type
@@ -177,41 +189,35 @@ async def finalize_task(message: types.Message, state: FSMContext):
     else:
         author_name = message.from_user.full_name or str(message.from_user.id)
 
-    # было:
-    # thread_id = cfg.threads_by_worktype.get(data["work_type"])
-    # стало:
-    thread_id = await repo.thread_id_for_worktype(data["work_type"])
-
-    chat_id = cfg.general_chat_ids[0]
-    me = await message.bot.me()
-
-    # публикация с жирными заголовками (реализовано в publish_assignment)
-    msg_chat_id, msg_id = await publish_assignment(
-        bot=message.bot,
-        chat_id=chat_id,
-        thread_id=thread_id,
-        assignment_id=a_id,
-        work_type=data["work_type"],
-        project=data["project"],
-        customer=customer_name,
-        total_volume=data["total_volume"],
-        deadline_text=deadline_text,
-        comment=comment,
-        deep_prefix=me.username,
-        author_name=author_name,
-        volume_label=volume_label,
+    # всё, что нужно publish_assignment, кроме темы (её берём из привязок на момент публикации)
+    await repo.enqueue_publication(
+        a_id,
+        config.general_chat_ids[0],
+        {
+            "work_type": data["work_type"],
+            "project": data["project"],
+            "customer": customers.name(customer_id),
+            "total_volume": str(data["total_volume"]),
+            "deadline_text": deadline_text,
+            "comment": comment,
+            "author_name": author_name,
+            "volume_label": volume_label,
+        },
+        conn=conn,
     )
-
-    await repo.mark_assignment_published(a_id, msg_chat_id, msg_id)
+    await uow.commit()
 
     await state.clear()
-    await message.answer("Задание опубликовано в общем чате ✅", reply_markup=_main_menu_for(message.from_user.id))
+    await message.answer(
+        f"Задание #{a_id} создано ✅ Публикация в общем чате — через несколько секунд.",
+        reply_markup=_main_menu_for(message.from_user.id, config),
+    )
 
 # --- прочие кнопки основного меню — только когда FSM НЕ активна ---
 
 @router.message(StateFilter(default_state), F.chat.type == "private", F.text == "📤 Мои выданные задания")
-async def my_assignments(message: types.Message):
-    items = await repo.my_assignments(message.from_user.id)
+async def my_assignments(message: types.Message, uow: UnitOfWork):
+    items = await repo.my_assignments(message.from_user.id, conn=await uow.connection())
     if not items:
         await message.answer("У вас нет выданных заданий.")
         return
@@ -222,8 +228,8 @@ async def my_assignments(message: types.Message):
     await message.answer("\n".join(lines))
 
 @router.message(StateFilter(default_state), F.chat.type == "private", F.text == "📋 Мои задачи")
-async def my_tasks(message: types.Message):
-    claims = await repo.my_open_claims(message.from_user.id)
+async def my_tasks(message: types.Message, uow: UnitOfWork):
+    claims = await repo.my_open_claims(message.from_user.id, conn=await uow.connection())
     if not claims:
         await message.answer("У вас нет невыполненных задач.")
         return
@@ -236,13 +242,24 @@ async def delete_my_task_enter(message: types.Message, state: FSMContext):
     await message.answer("Введите ID вашей незакрытой задачи (целое число):", reply_markup=task_creation_menu())
 
 @router.message(DeleteClaim.wait_id, IsPositiveInt())
-async def delete_my_task_do(message: types.Message, state: FSMContext):
+async def delete_my_task_do(
+    message: types.Message,
+    state: FSMContext,
+    config: Config,
+    uow: UnitOfWork,
+    live: LiveStatusUpdater,
+):
     claim_id = int(message.text)
-    ok = await repo.delete_my_open_claim(claim_id, message.from_user.id)
+    assignment_id = await repo.delete_my_open_claim(
+        claim_id, message.from_user.id, conn=await uow.connection()
+    )
+    if assignment_id is not None:
+        uow.after_commit(lambda: live.touch(message.bot, assignment_id))
+    await uow.commit()
     await state.clear()
     await message.answer(
-        "Удалено ✅" if ok else "Не найдено / нет прав.",
-        reply_markup=_main_menu_for(message.from_user.id),
+        "Удалено ✅" if assignment_id is not None else "Не найдено / нет прав.",
+        reply_markup=_main_menu_for(message.from_user.id, config),
     )
 
 @router.message(DeleteClaim.wait_id)
@@ -1,33 +1,114 @@
 from __future__ import annotations
-import asyncio
+import logging
+import time
+
+from ..db import repo
 
 
 class AllowedUsers:
     """
     Памятка пользователей, которым разрешён доступ (is_member=true в БД).
+    Снимок — неизменяемый frozenset: чтение без блокировок, запись собирает
+    новый снимок и подменяет ссылку целиком (copy-on-write), version растёт
+    на каждую подмену. Промах проверяется по БД, отрицательный ответ кэшируется
+    на negative_ttl секунд. Изменения с других реплик приходят через
+    NOTIFY users_membership_changed (payload «user_id:0|1»).
     """
 
-    def __init__(self) -> None:
-        self._ids: set[int] = set()
-        self._lock = asyncio.Lock()
+    MAX_NEGATIVE = 50_000
+
+    def __init__(self, negative_ttl: float = 60.0) -> None:
+        self._ids: frozenset[int] = frozenset()
+        self.version = 0
+        self.negative_ttl = negative_ttl
+        # user_id -> monotonic-время, до которого «не член» считается актуальным
+        self._negative: dict[int, float] = {}
+
+        # метрики
+        self.hits = 0
+        self.negative_hits = 0
+        self.db_lookups = 0
+
+    def _swap(self, ids: frozenset[int]) -> None:
+        self._ids = ids
+        self.version += 1
 
     async def load(self, ids: list[int]) -> None:
-        async with self._lock:
-            self._ids = set(ids)
+        self._swap(frozenset(ids))
+        self._negative.clear()
+
+    async def reload(self) -> None:
+        """Перечитать снимок из БД. Если за время запроса пришли точечные изменения — повторить."""
+        for _ in range(3):
+            version = self.version
+            ids = await repo.list_member_user_ids()
+            if self.version == version:
+                await self.load(ids)
+                return
+        logging.warning("allowed: membership keeps changing during reload, using last result")
+        await self.load(ids)
 
     async def add(self, user_id: int) -> None:
-        async with self._lock:
-            self._ids.add(user_id)
+        self._negative.pop(user_id, None)
+        if user_id not in self._ids:
+            self._swap(self._ids | {user_id})
 
     async def remove(self, user_id: int) -> None:
-        async with self._lock:
-            self._ids.discard(user_id)
+        if user_id in self._ids:
+            self._swap(self._ids - {user_id})
+
+    async def apply(self, added: list[int], removed: list[int]) -> None:
+        """Применить дифф членства (результат аудита) одной подменой снимка."""
+        for uid in added:
+            self._negative.pop(uid, None)
+        self._swap((self._ids - frozenset(removed)) | frozenset(added))
 
     async def contains(self, user_id: int) -> bool:
-        async with self._lock:
-            return user_id in self._ids
+        if user_id in self._ids:  # быстрый путь: без await и блокировок
+            self.hits += 1
+            return True
+        now = time.monotonic()
+        until = self._negative.get(user_id)
+        if until is not None and until > now:
+            self.negative_hits += 1
+            return False
+
+        # промах: возможно, зарегистрировался на другой реплике, а NOTIFY ещё в пути
+        self.db_lookups += 1
+        version = self.version
+        is_member = await repo.user_is_member(user_id)
+        if is_member:
+            await self.add(user_id)
+            return True
+        if self.version == version or user_id not in self._ids:
+            if len(self._negative) >= self.MAX_NEGATIVE:
+                self._negative = {k: t for k, t in self._negative.items() if t > now}
+                if len(self._negative) >= self.MAX_NEGATIVE:
+                    self._negative.clear()
+            self._negative[user_id] = now + self.negative_ttl
+        return user_id in self._ids
+
+    async def on_notify(self, payload: str | None) -> None:
+        if not payload:
+            # переподключение слушателя — уведомления могли потеряться
+            await self.reload()
+            return
+        uid, _, flag = payload.partition(":")
+        if flag == "1":
+            await self.add(int(uid))
+        else:
+            await self.remove(int(uid))
 
     # только для отладки/метрик
     async def snapshot(self) -> set[int]:
-        async with self._lock:
-            return set(self._ids)
+        return set(self._ids)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "members": len(self._ids),
+            "version": self.version,
+            "hits": self.hits,
+            "negative_cached": len(self._negative),
+            "negative_hits": self.negative_hits,
+            "db_lookups": self.db_lookups,
+        }
@@ -0,0 +1,38 @@
+from __future__ import annotations
+import logging
+
+from aiogram.types import InlineKeyboardMarkup
+
+from ..db import repo
+from ..keyboards.inline import customers_keyboard
+
+
+class CustomerDirectory:
+    """
+    Справочник заказчиков в памяти: id → имя и готовая inline-клавиатура
+    активных заказчиков. Перечитывается по NOTIFY customers_changed,
+    поэтому сценарий создания задания в БД за заказчиками не ходит.
+    """
+
+    def __init__(self) -> None:
+        self._names: dict[int, str] = {}
+        self._keyboard: InlineKeyboardMarkup = customers_keyboard([])
+
+    async def load(self) -> None:
+        rows = await repo.list_customers(active_only=False)
+        active = [r for r in rows if r["is_active"]]
+        names = {int(r["id"]): r["name"] for r in rows}
+        keyboard = customers_keyboard(active)
+        # подмена ссылками — читатели всегда видят согласованный снимок
+        self._names, self._keyboard = names, keyboard
+        logging.info("customers cache loaded: %d (%d active)", len(rows), len(active))
+
+    async def on_notify(self, payload: str | None) -> None:
+        await self.load()
+
+    @property
+    def keyboard(self) -> InlineKeyboardMarkup:
+        return self._keyboard
+
+    def name(self, customer_id: int) -> str | None:
+        return self._names.get(customer_id)
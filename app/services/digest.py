@@ -0,0 +1,135 @@
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from ..db import repo
+from .publisher import human_worktype
+from .threads import ThreadBindings
+
+# Лимит Telegram — 4096 символов; запас под заголовок «(часть i/N)»
+MAX_TEXT = 3900
+# Кнопок в одной клавиатуре — не больше, чем строк в части
+MAX_ITEMS = 40
+BUTTONS_PER_ROW = 4
+
+
+def render_pages(
+    items: list[dict[str, Any]],
+    deep_prefix: str,
+) -> list[tuple[str, InlineKeyboardMarkup]]:
+    """
+    Части дайджеста одной темы: компактный список «#id · вид · свободно N»
+    и кнопки-диплинки на каждое задание. Режется по длине текста и числу кнопок.
+    """
+    chunks: list[list[dict[str, Any]]] = [[]]
+    size = 0
+    for a in items:
+        line = f"#{a['id']} · {human_worktype(a['work_type'])} · свободно <b>{a['free_volume']}</b>"
+        a = {**a, "line": line}
+        if chunks[-1] and (size + len(line) + 1 > MAX_TEXT or len(chunks[-1]) >= MAX_ITEMS):
+            chunks.append([])
+            size = 0
+        chunks[-1].append(a)
+        size += len(line) + 1
+
+    pages = []
+    for i, chunk in enumerate(chunks, 1):
+        header = f"🔔 Свободные задания: {len(items)}"
+        if len(chunks) > 1:
+            header += f" (часть {i}/{len(chunks)})"
+        text = "\n".join([header, ""] + [a["line"] for a in chunk])
+        buttons = [
+            InlineKeyboardButton(text=f"#{a['id']}", url=f"https://t.me/{deep_prefix}?start=assign_{a['id']}")
+            for a in chunk
+        ]
+        rows = [buttons[j:j + BUTTONS_PER_ROW] for j in range(0, len(buttons), BUTTONS_PER_ROW)]
+        pages.append((text, InlineKeyboardMarkup(inline_keyboard=rows)))
+    return pages
+
+
+class ReminderDigests:
+    """
+    Напоминания дайджестом: одно сообщение (или несколько частей) на тему
+    вместо сообщения на каждое задание. Прошлый дайджест темы берётся из
+    reminder_digests и либо правится на месте (edit=True), либо заменяется:
+    новый отправляется вниз темы, старый удаляется. Трафик растёт с числом тем,
+    а не заданий. Состояние в БД — после смены лидера продолжаем те же сообщения.
+    """
+
+    def __init__(self, edit: bool = False, limit: int = 500) -> None:
+        self.edit = edit
+        self.limit = limit
+
+    async def run(self, bot: Bot, threads: ThreadBindings) -> None:
+        ass = await repo.list_free_assignments(limit=self.limit)
+        topics: dict[tuple[int, int], list[dict[str, Any]]] = {}
+        for a in ass:
+            key = (int(a["published_chat_id"]), threads.get(a["work_type"]) or 0)
+            topics.setdefault(key, []).append(a)
+
+        previous = await repo.list_reminder_digests()
+        me = await bot.me()
+        # темы, где всё разобрано, тоже обходим — чтобы убрать устаревший дайджест
+        keys = list(topics.keys() | previous.keys())
+        results = await asyncio.gather(
+            *(
+                self._topic(bot, key, topics.get(key, []), previous.get(key, []), me.username)
+                for key in keys
+            ),
+            return_exceptions=True,
+        )
+        for key, res in zip(keys, results):
+            if isinstance(res, Exception):
+                logging.error(
+                    "remind digest: failed for chat=%s thread=%s: %r", key[0], key[1], res
+                )
+
+    async def _topic(
+        self,
+        bot: Bot,
+        key: tuple[int, int],
+        items: list[dict[str, Any]],
+        old_ids: list[int],
+        deep_prefix: str,
+    ) -> None:
+        chat_id, thread_id = key
+        pages = render_pages(items, deep_prefix) if items else []
+        new_ids: list[int] = []
+        reusable = list(old_ids) if self.edit else []
+
+        for text, markup in pages:
+            message_id = reusable.pop(0) if reusable else None
+            if message_id is not None:
+                try:
+                    await bot.edit_message_text(
+                        text, chat_id=chat_id, message_id=message_id, reply_markup=markup
+                    )
+                    new_ids.append(message_id)
+                    continue
+                except TelegramBadRequest as e:
+                    if "message is not modified" in str(e):
+                        new_ids.append(message_id)
+                        continue
+                    # сообщение удалили руками — отправим заново
+                    logging.info(
+                        "remind digest: cannot edit %s in chat=%s: %s", message_id, chat_id, e
+                    )
+            msg = await bot.send_message(
+                chat_id, text, message_thread_id=thread_id or None, reply_markup=markup,
+            )
+            new_ids.append(msg.message_id)
+
+        # что не переиспользовали — удаляем; сохраняем до удаления, чтобы не потерять новые id
+        await repo.save_reminder_digest(chat_id, thread_id, new_ids)
+        for message_id in old_ids:
+            if message_id in new_ids:
+                continue
+            try:
+                await bot.delete_message(chat_id, message_id)
+            except TelegramBadRequest:
+                pass  # уже удалено или старше 48 часов — Telegram не даст удалить
@@ -0,0 +1,139 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Hashable
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+
+
+class UpdateLanes:
+    """
+    Очереди обработки апдейтов: одна «дорожка» на ключ (чат, пользователь).
+    Внутри дорожки апдейты идут строго по порядку — шаги FSM одного
+    пользователя не перемешиваются; разные дорожки работают параллельно,
+    но одновременно не больше concurrency апдейтов. Всего в очередях
+    не больше max_pending апдейтов: submit() ждёт места — это и есть
+    обратное давление на приём (polling / HTTP-ответ вебхука).
+    """
+
+    def __init__(self, concurrency: int = 16, max_pending: int = 1000) -> None:
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_pending = max_pending
+        self._lanes: dict[Hashable, deque[tuple[Callable[[], Awaitable[Any]], float]]] = {}
+        self._workers: set[asyncio.Task] = set()
+        self._space = asyncio.Event()
+        self.pending = 0
+
+        # метрики
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.backpressured = 0
+        self.wait_avg = 0.0  # EMA ожидания в очереди, сек
+        self.wait_max = 0.0
+
+    async def submit(self, key: Hashable, job: Callable[[], Awaitable[Any]]) -> None:
+        """Ставит job в дорожку key; возвращается, как только апдейт принят в очередь."""
+        if self.pending >= self.max_pending:
+            self.backpressured += 1
+            while self.pending >= self.max_pending:
+                self._space.clear()
+                await self._space.wait()
+        self.pending += 1
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+            worker = asyncio.create_task(self._run_lane(key, lane))
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+        lane.append((job, time.monotonic()))
+
+    def _observe(self, seconds: float) -> None:
+        self.wait_avg = seconds if self.processed == 0 else self.wait_avg * 0.9 + seconds * 0.1
+        self.wait_max = max(self.wait_max, seconds)
+
+    async def _run_lane(self, key: Hashable, lane: deque) -> None:
+        try:
+            while lane:
+                job, enqueued = lane.popleft()
+                async with self.semaphore:
+                    self._observe(time.monotonic() - enqueued)
+                    self.in_flight += 1
+                    try:
+                        await job()
+                    except Exception:
+                        self.failed += 1
+                        logging.exception("lanes: update processing failed (key=%s)", key)
+                    finally:
+                        self.in_flight -= 1
+                        self.processed += 1
+                self.pending -= 1
+                self._space.set()
+        finally:
+            # между проверкой `while lane` и удалением нет await — новый submit сюда не вклинится
+            del self._lanes[key]
+
+    async def drain(self, timeout: float = 30.0) -> None:
+        """Дождаться обработки уже принятых апдейтов (на остановке)."""
+        if not self._workers:
+            return
+        _, pending = await asyncio.wait(set(self._workers), timeout=timeout)
+        if pending:
+            logging.warning(
+                "lanes: %d lanes still busy after %.0fs, cancelling", len(pending), timeout
+            )
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "lanes": len(self._lanes),
+            "max_lane_depth": max((len(q) for q in self._lanes.values()), default=0),
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "backpressured": self.backpressured,
+            "wait_avg_ms": round(self.wait_avg * 1000, 1),
+            "wait_max_ms": round(self.wait_max * 1000, 1),
+        }
+
+
+def lane_key(update: Update) -> Hashable:
+    """Ключ дорожки — как у FSM: (чат, пользователь). Без них — отдельная дорожка на апдейт."""
+    ctx = UserContextMiddleware.resolve_event_context(update)
+    if ctx.chat is None and ctx.user is None:
+        return ("update", update.update_id)
+    return (ctx.chat.id if ctx.chat else None, ctx.user.id if ctx.user else None)
+
+
+class LanedDispatcher(Dispatcher):
+    """
+    Dispatcher, который прогоняет каждый апдейт через UpdateLanes.
+    Встраиваемся в feed_update, а не в middleware: встроенная FSMContextMiddleware
+    читает raw_state раньше любых наших outer-мидлварей, и порядок нужен уже ей.
+    feed_update возвращает управление после постановки в очередь, поэтому
+    polling запускается с handle_as_tasks=False, а вебхук — без handle_in_background.
+    """
+
+    def __init__(self, *args: Any, lanes: UpdateLanes, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.lanes = lanes
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        async def job() -> None:
+            await super(LanedDispatcher, self).feed_update(bot, update, **kwargs)
+
+        await self.lanes.submit(lane_key(update), job)
+        return None
+
+    async def emit_shutdown(self, *args: Any, **kwargs: Any) -> None:
+        # сначала доделываем принятые апдейты, потом storage.close() и прочие хуки
+        await self.lanes.drain()
+        await super().emit_shutdown(*args, **kwargs)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from ..db import repo
+from .publisher import assignment_markup, render_assignment_text
+
+
+class LiveStatusUpdater:
+    """
+    Держит опубликованные сообщения о заданиях в актуальном виде: после взятия
+    или удаления задачи обработчик вызывает touch(), а правка уходит одна на
+    задание за окно debounce секунд — 50 взятий подряд дают один editMessageText.
+    touch() нужно вызывать после коммита изменений (uow.after_commit), иначе
+    правка может прочитать старое состояние. Состояние читается из БД в момент
+    правки одним запросом на все задания окна; неизменившийся текст не отправляется.
+    """
+
+    MAX_REMEMBERED = 10_000
+
+    def __init__(self, debounce: float = 3.0) -> None:
+        self.debounce = debounce
+        self._pending: set[int] = set()
+        self._task: asyncio.Task | None = None
+        # assignment_id -> последний отправленный текст
+        self._last_text: OrderedDict[int, str] = OrderedDict()
+
+        # метрики
+        self.touches = 0
+        self.edits = 0
+        self.failed = 0
+
+    def touch(self, bot: Bot, assignment_id: int) -> None:
+        self.touches += 1
+        self._pending.add(assignment_id)
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_later(bot), name="live-status")
+
+    async def _flush_later(self, bot: Bot) -> None:
+        await asyncio.sleep(self.debounce)
+        # новые touch() во время правок соберутся в следующее окно
+        ids, self._pending, self._task = self._pending, set(), None
+        try:
+            await self.flush(bot, sorted(ids))
+        except Exception:
+            logging.exception("live status: failed to refresh %d assignments", len(ids))
+
+    async def flush(self, bot: Bot, assignment_ids: list[int]) -> None:
+        rows = await repo.published_assignment_states(assignment_ids)
+        me = await bot.me()
+        await asyncio.gather(*(self._edit(bot, row, me.username) for row in rows))
+
+    async def _edit(self, bot: Bot, row: dict[str, Any], deep_prefix: str) -> None:
+        aid = row["id"]
+        text = render_assignment_text(
+            aid, **row["publish_payload"],
+            free_volume=row["free_volume"], is_active=row["is_active"],
+        )
+        if self._last_text.get(aid) == text:
+            return
+        try:
+            await bot.edit_message_text(
+                text,
+                chat_id=row["published_chat_id"],
+                message_id=row["published_message_id"],
+                reply_markup=assignment_markup(aid, deep_prefix),
+                parse_mode="HTML",
+            )
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                self.failed += 1
+                logging.warning("live status: cannot edit assignment #%s: %s", aid, e)
+                return
+        except Exception:
+            self.failed += 1
+            logging.exception("live status: edit failed for assignment #%s", aid)
+            return
+        self.edits += 1
+        self._last_text[aid] = text
+        self._last_text.move_to_end(aid)
+        while len(self._last_text) > self.MAX_REMEMBERED:
+            self._last_text.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "touches": self.touches,
+            "edits": self.edits,
+            "failed": self.failed,
+            "pending": len(self._pending),
+        }
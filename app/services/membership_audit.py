@@ -0,0 +1,107 @@
+from __future__ import annotations
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter
+
+from ..db import repo
+from .allowed import AllowedUsers
+from .registration import RegistrationCache
+
+
+class MembershipAuditor:
+    """
+    Инкрементальный аудит членства в общем чате.
+    За один запуск проверяется не больше batch_size пользователей (сначала —
+    давно не проверенные: время проверки хранится в users.verified_at, так что
+    очерёдность переживает рестарт и смену лидера), параллельно не больше concurrency запросов
+    getChatMember и не дольше time_budget секунд. Так полный обход растягивается
+    на несколько тиков, а нагрузка на Bot API за тик остаётся ограниченной.
+    Ответы Telegram продлевают (или сбрасывают) проверку в кэше регистрации —
+    /start у недавно проверенных обходится без getChatMember.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 200,
+        concurrency: int = 10,
+        time_budget: float = 40.0,
+        registrations: RegistrationCache | None = None,
+    ) -> None:
+        self.registrations = registrations
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.time_budget = time_budget
+
+    @staticmethod
+    async def _check(bot: Bot, chat_id: int, uid: int) -> bool | None:
+        """True/False — ответ Telegram; None — проверить не удалось, повторим позже."""
+        try:
+            m = await bot.get_chat_member(chat_id, uid)
+            return m.status in ("member", "administrator", "creator")
+        except (TelegramRetryAfter, TelegramNetworkError):
+            return None
+        except TelegramAPIError:
+            # Telegram вернул ошибку (бота нет в чате / пользователь не найден)
+            return False
+        except Exception:
+            logging.exception("membership audit: getChatMember failed for uid=%s", uid)
+            return None
+
+    async def run(self, bot: Bot, chat_id: int, admins: set[int], allowed: AllowedUsers) -> None:
+        try:
+            # Админ — всегда член, Telegram не спрашиваем
+            promoted = await repo.ensure_admin_membership(sorted(admins))
+            # {uid: is_member в БД} — самые давно проверенные, без админов
+            shard = await repo.stale_memberships(self.batch_size, sorted(admins))
+        except Exception:
+            logging.exception("membership audit: failed to load the next shard")
+            return
+        if promoted:
+            await allowed.apply(promoted, [])
+
+        # ответы Telegram: {uid: is_member}; не ответившие останутся в начале очереди
+        checks: dict[int, bool] = {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def verify(uid: int) -> None:
+            async with semaphore:
+                is_member = await self._check(bot, chat_id, uid)
+            if is_member is None:
+                return
+            checks[uid] = is_member
+            if self.registrations is not None:
+                if is_member:
+                    self.registrations.mark_verified(uid)
+                else:
+                    self.registrations.forget(uid)
+
+        tasks = [asyncio.create_task(verify(uid)) for uid in shard]
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=self.time_budget)
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if pending:
+                logging.warning(
+                    "membership audit: time budget exhausted, %d of %d checks postponed",
+                    len(pending), len(tasks),
+                )
+
+        if not checks:
+            return
+
+        try:
+            written = await repo.save_membership_checks(checks)
+        except Exception:
+            logging.exception("membership audit: failed to persist %d checks", len(checks))
+            return
+
+        added = [uid for uid, m in checks.items() if m and not shard[uid]]
+        removed = [uid for uid, m in checks.items() if not m and shard[uid]]
+        await allowed.apply(added, removed)
+        logging.info(
+            "membership audit: checked %d/%d, %d rows stamped (+%d / -%d), %d admins fixed",
+            len(checks), len(shard), written, len(added), len(removed), len(promoted),
+        )
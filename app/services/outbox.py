@@ -0,0 +1,148 @@
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from ..db import repo
+from .publisher import publish_assignment
+from .threads import ThreadBindings
+
+
+class OutboxDispatcher:
+    """
+    Фоновая публикация заданий из publish_outbox.
+    Пачка строк берётся в аренду на lease секунд коротким запросом (FOR UPDATE
+    SKIP LOCKED + сдвиг next_attempt_at, сразу коммит) и публикуется параллельно
+    (темп держит SendScheduler) — блокировки во время отправки не держатся.
+    Результат каждой строки пишется своей короткой транзакцией: успешная строка
+    удаляется вместе с записью chat/message id в assignments, неудачная —
+    откладывается с экспоненциальной паузой; ошибка записи одной строки не
+    откатывает остальные. Работает на каждой реплике. Доставка — «хотя бы один
+    раз»: при падении между отправкой и записью результата задание будет
+    опубликовано повторно после окончания аренды.
+    Будится NOTIFY publish_outbox, на случай потери уведомления — опрос раз в poll_interval.
+    """
+
+    MAX_ATTEMPTS = 10
+    MAX_BACKOFF = 300
+
+    def __init__(
+        self,
+        threads: ThreadBindings,
+        batch_size: int = 20,
+        poll_interval: float = 10.0,
+        lease: float = 300.0,
+    ) -> None:
+        self.threads = threads
+        self.batch_size = batch_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+        # метрики
+        self.published = 0
+        self.failed = 0
+
+    async def on_notify(self, payload: str | None) -> None:
+        self._wakeup.set()
+
+    async def _publish(self, bot: Bot, row: dict[str, Any]) -> tuple[int, int]:
+        p = row["payload"]
+        me = await bot.me()
+        return await publish_assignment(
+            bot=bot,
+            chat_id=row["chat_id"],
+            thread_id=self.threads.get(p["work_type"]),
+            assignment_id=row["assignment_id"],
+            work_type=p["work_type"],
+            project=p["project"],
+            customer=p["customer"],
+            total_volume=p["total_volume"],
+            deadline_text=p["deadline_text"],
+            comment=p["comment"],
+            deep_prefix=me.username,
+            author_name=p["author_name"],
+            volume_label=p["volume_label"],
+        )
+
+    def _retry_in(self, row: dict[str, Any], error: Exception) -> float | None:
+        attempts = row["attempts"] + 1
+        if attempts >= self.MAX_ATTEMPTS:
+            return None
+        if isinstance(error, (TelegramBadRequest, TelegramForbiddenError)):
+            # чат/тема недоступны — ждём, пока поправят конфиг или права бота
+            return float(self.MAX_BACKOFF)
+        return float(min(2 ** attempts, self.MAX_BACKOFF))
+
+    async def _process(self, bot: Bot, row: dict[str, Any]) -> None:
+        try:
+            chat_id, message_id = await self._publish(bot, row)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            retry_in = self._retry_in(row, e)
+            log = logging.error if retry_in is None else logging.warning
+            log("outbox: failed to publish assignment #%s (attempt %d): %r",
+                row["assignment_id"], row["attempts"] + 1, e)
+            await repo.fail_publication(row["id"], repr(e), retry_in)
+            return
+        self.published += 1
+        try:
+            await repo.complete_publication(row["id"], chat_id, message_id)
+        except Exception:
+            # сообщение уже в чате; строка созреет по окончании аренды — возможен дубль
+            logging.exception(
+                "outbox: failed to record publication of assignment #%s", row["assignment_id"]
+            )
+
+    async def run_batch(self, bot: Bot) -> int:
+        """Одна пачка; возвращает число взятых строк (0 — очередь пуста)."""
+        rows = await repo.claim_publications(self.batch_size, self.lease)
+        if not rows:
+            return 0
+        results = await asyncio.gather(
+            *(self._process(bot, r) for r in rows), return_exceptions=True
+        )
+        for row, res in zip(rows, results):
+            if isinstance(res, Exception):
+                logging.error(
+                    "outbox: failed to record result for assignment #%s: %r",
+                    row["assignment_id"], res,
+                )
+        return len(rows)
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                while await self.run_batch(bot) == self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("outbox: batch failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, bot: Bot) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(bot), name="publish-outbox")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        return {"published": self.published, "failed": self.failed}
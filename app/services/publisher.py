@@ -17,23 +17,26 @@ _HUMAN_WORKTYPE = {
     "shooting":"Съёмка",
 }
 
-async def publish_assignment(
-    bot: Bot,
-    chat_id: int,
-    thread_id: int | None,
+def human_worktype(work_type: str) -> str:
+    return _HUMAN_WORKTYPE.get(work_type, work_type.capitalize())
+
+
+def render_assignment_text(
     assignment_id: int,
-    work_type: str,                 # design | montage | shooting | ...
+    work_type: str,
     project: str | None,
     customer: str | None,
-    total_volume: Decimal,
-    deadline_text: str,             # ожид.: "%d.%m.%Y %H:%M"
+    total_volume: Decimal | str,
+    deadline_text: str,
     comment: str | None,
-    deep_prefix: str,
-    author_name: str,               # НОВОЕ: "@username" или "ФИО"
-    volume_label: str,              # НОВОЕ: "КОЛИЧЕСТВО КАРТОЧЕК/ОПЕРАТОРОВ/РОЛИКОВ"
-):
+    author_name: str,
+    volume_label: str,
+    free_volume: Decimal | str | None = None,
+    is_active: bool = True,
+) -> str:
     """
-    Публикует сообщение о задании в общий чат в требуемом формате (HTML).
+    Текст сообщения о задании (HTML). free_volume — строка «СВОБОДНО»
+    (при публикации равна общему объёму, дальше её обновляет LiveStatusUpdater).
     """
 
     # Разделим срок на дату и время (ожидаем пробел между ними)
@@ -41,7 +44,7 @@ async def publish_assignment(
     deadline_date = parts[0] if parts and parts[0] else "—"
     deadline_time = parts[1] if len(parts) > 1 else "—"
 
-    worktype_h = _HUMAN_WORKTYPE.get(work_type, work_type.capitalize())
+    worktype_h = human_worktype(work_type)
 
     text_lines = [
         f"📌СОЗДАНО ЗАДАНИЕ - {assignment_id} !",
@@ -55,14 +58,46 @@ async def publish_assignment(
         f"<b>АВТОР ЗАДАНИЯ:</b> {author_name}",
         "",
         f"<b>{volume_label}:</b> {total_volume}",
-        "",
-        f"<b>НАЗВАНИЕ ПРОЕКТА:</b> {project or '—'}",
     ]
 
+    if not is_active:
+        text_lines.append("<b>⛔ ЗАДАНИЕ ЗАКРЫТО</b>")
+    elif free_volume is not None:
+        if Decimal(free_volume) > 0:
+            text_lines.append(f"<b>🟢СВОБОДНО:</b> {free_volume}")
+        else:
+            text_lines.append("<b>✅ВСЁ РАЗОБРАНО</b>")
+
+    text_lines.extend(["", f"<b>НАЗВАНИЕ ПРОЕКТА:</b> {project or '—'}"])
+
     if comment:
         text_lines.extend(["", f"<b>📝КОММЕНТАРИИ:</b> {comment}"])
 
-    text = "\n".join(text_lines)
+    return "\n".join(text_lines)
+
+
+async def publish_assignment(
+    bot: Bot,
+    chat_id: int,
+    thread_id: int | None,
+    assignment_id: int,
+    work_type: str,                 # design | montage | shooting | ...
+    project: str | None,
+    customer: str | None,
+    total_volume: Decimal | str,
+    deadline_text: str,             # ожид.: "%d.%m.%Y %H:%M"
+    comment: str | None,
+    deep_prefix: str,
+    author_name: str,               # НОВОЕ: "@username" или "ФИО"
+    volume_label: str,              # НОВОЕ: "КОЛИЧЕСТВО КАРТОЧЕК/ОПЕРАТОРОВ/РОЛИКОВ"
+):
+    """
+    Публикует сообщение о задании в общий чат в требуемом формате (HTML).
+    """
+    text = render_assignment_text(
+        assignment_id, work_type, project, customer, total_volume, deadline_text,
+        comment, author_name, volume_label, free_volume=total_volume,
+    )
     kb = assignment_markup(assignment_id, deep_prefix)
 
     # В main уже стоит DefaultBotProperties(parse_mode=HTML), но явно укажем на всякий случай
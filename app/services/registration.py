@@ -0,0 +1,84 @@
+from __future__ import annotations
+import logging
+import time
+from typing import NamedTuple
+
+from ..db import repo
+
+
+class Profile(NamedTuple):
+    username: str | None
+    full_name: str | None
+    is_admin: bool
+    is_member: bool
+
+
+class RegistrationCache:
+    """
+    Проверенное членство и последняя записанная в users версия профиля.
+    Пока проверка свежа (ttl секунд) и профиль не менялся, /start — в том
+    числе каждый клик по диплинку из общего чата — обходится без getChatMember
+    и без записи в БД. Свежесть дают: загрузка из БД на старте, аудит членства,
+    chat_member-апдейты и NOTIFY users_membership_changed с других реплик.
+    """
+
+    def __init__(self, ttl: float = 1800.0) -> None:
+        self.ttl = ttl
+        # user_id -> monotonic-время, до которого членство считается проверенным
+        self._verified_until: dict[int, float] = {}
+        self._profiles: dict[int, Profile] = {}
+
+        # метрики
+        self.telegram_checks = 0
+        self.upserts = 0
+        self.skipped = 0
+
+    async def load(self) -> None:
+        rows = await repo.list_user_profiles()
+        until = time.monotonic() + self.ttl
+        self._profiles = {
+            r["id"]: Profile(r["username"], r["full_name"], r["is_admin"], r["is_member"])
+            for r in rows
+        }
+        self._verified_until = {uid: until for uid, p in self._profiles.items() if p.is_member}
+        logging.info(
+            "registration cache loaded: %d users, %d verified",
+            len(self._profiles), len(self._verified_until),
+        )
+
+    def is_verified(self, user_id: int) -> bool:
+        return self._verified_until.get(user_id, 0.0) > time.monotonic()
+
+    def mark_verified(self, user_id: int) -> None:
+        self._verified_until[user_id] = time.monotonic() + self.ttl
+
+    def forget(self, user_id: int) -> None:
+        self._verified_until.pop(user_id, None)
+        self._profiles.pop(user_id, None)
+
+    def needs_upsert(self, user_id: int, profile: Profile) -> bool:
+        return self._profiles.get(user_id) != profile
+
+    def remember(self, user_id: int, profile: Profile) -> None:
+        """Вызывать после коммита записи (uow.after_commit)."""
+        self._profiles[user_id] = profile
+
+    async def on_notify(self, payload: str | None) -> None:
+        if not payload:
+            await self.load()
+            return
+        uid, _, flag = payload.partition(":")
+        if flag == "1":
+            # is_member=true пишут только после проверки (chat_member, аудит, /start)
+            self.mark_verified(int(uid))
+        else:
+            self.forget(int(uid))
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "verified": sum(1 for t in self._verified_until.values() if t > time.monotonic()),
+            "profiles": len(self._profiles),
+            "telegram_checks": self.telegram_checks,
+            "upserts": self.upserts,
+            "skipped": self.skipped,
+        }
@@ -0,0 +1,275 @@
+from __future__ import annotations
+import asyncio
+import heapq
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Protocol
+
+from aiogram import Bot
+
+from ..db import repo
+from .digest import render_pages
+from .threads import ThreadBindings
+
+
+class Clock(Protocol):
+    def now(self) -> datetime: ...
+
+    async def sleep(self, seconds: float) -> None: ...
+
+
+class SystemClock:
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+def _aware(dt: datetime) -> datetime:
+    # deadline_at хранится без пояснения пояса (как ввёл автор) —
+    # считаем его локальным временем сервера
+    return dt if dt.tzinfo else dt.astimezone()
+
+
+@dataclass(frozen=True)
+class RemindPolicy:
+    """
+    Когда напомнить о задании в следующий раз.
+    Без взятий интервал удваивается (min_interval · 2^streak, не больше max_interval),
+    но не превышает трети оставшегося до срока времени — чем ближе срок, тем чаще.
+    Напоминание, которое пришлось бы на срок или позже, не планируется.
+    """
+
+    min_interval: timedelta = timedelta(minutes=30)
+    max_interval: timedelta = timedelta(hours=12)
+
+    def next_at(self, now: datetime, deadline_at: datetime | None, streak: int) -> datetime | None:
+        interval = min(self.max_interval, self.min_interval * (2 ** min(streak, 16)))
+        if deadline_at is not None:
+            left = _aware(deadline_at) - now
+            if left <= timedelta(0):
+                return None
+            interval = max(self.min_interval, min(interval, left / 3))
+            if interval >= left:
+                # до срока меньше минимального интервала — последнее напоминание уже было
+                return None
+        return now + interval
+
+
+class ReminderQueue:
+    """
+    Min-куча (время, id) с ленивым удалением: актуальное время задания — в _due,
+    устаревшие записи кучи пропускаются при чтении. Без ввода-вывода — тестируется
+    симуляцией (bench/remind_sim.py).
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int]] = []
+        self._due: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, assignment_id: int, at: datetime) -> None:
+        ts = at.timestamp()
+        self._due[assignment_id] = ts
+        heapq.heappush(self._heap, (ts, assignment_id))
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(t, a) for a, t in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def discard(self, assignment_id: int) -> None:
+        self._due.pop(assignment_id, None)
+
+    def _skip_stale(self) -> None:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> datetime | None:
+        self._skip_stale()
+        return datetime.fromtimestamp(self._heap[0][0], timezone.utc) if self._heap else None
+
+    def pop_due(self, now: datetime) -> list[int]:
+        """Все задания со временем ≤ now — O(k log n) для k подошедших."""
+        ts, due = now.timestamp(), []
+        while True:
+            self._skip_stale()
+            if not self._heap or self._heap[0][0] > ts:
+                return due
+            _, aid = heapq.heappop(self._heap)
+            del self._due[aid]
+            due.append(aid)
+
+
+class DeadlineReminders:
+    """
+    Напоминания по расписанию каждого задания (REMIND_MODE=deadline) вместо
+    интервального прохода по всем открытым. Спит до ближайшего срока в куче;
+    за пробуждение читает из БД и напоминает только о подошедших (одним сообщением
+    на тему), новое время сохраняется в assignments.next_remind_at — после
+    рестарта или смены лидера расписание продолжается, а не начинается заново.
+    Новые публикации подхватываются досинхронизацией раз в resync_every секунд
+    (только незапланированные, по частичному индексу). Если сообщение в тему
+    не ушло, её задания повторяются через retry_delay без роста интервала.
+    """
+
+    def __init__(
+        self,
+        policy: RemindPolicy,
+        resync_every: float = 300.0,
+        clock: Clock | None = None,
+        retry_delay: timedelta = timedelta(minutes=5),
+    ) -> None:
+        self.policy = policy
+        self.resync_every = resync_every
+        self.retry_delay = retry_delay
+        self.clock = clock or SystemClock()
+        self.queue = ReminderQueue()
+        self._task: asyncio.Task | None = None
+
+        # метрики
+        self.wakeups = 0
+        self.reminded = 0
+        self.retried = 0
+
+    async def _plan(self, rows: list[dict[str, Any]]) -> None:
+        """Ставит в кучу загруженные строки; незапланированным назначает первое время."""
+        now = self.clock.now()
+        fresh: list[tuple[int, Any, int, Decimal | None]] = []
+        for r in rows:
+            at = r["next_remind_at"]
+            if at is None:
+                at = self.policy.next_at(now, r["deadline_at"], 0)
+                if at is None:
+                    # уже в последнем окне до срока: в БД и так NULL — не переписываем
+                    # (и не сбрасываем remind_count) на каждой досинхронизации
+                    continue
+                fresh.append((r["id"], at, 0, None))
+            self.queue.schedule(r["id"], at)
+        await repo.save_reminder_schedule(fresh)
+
+    async def load(self) -> None:
+        self.queue = ReminderQueue()
+        await self._plan(await repo.list_reminder_schedule())
+
+    async def resync(self) -> None:
+        await self._plan(await repo.list_reminder_schedule(only_unscheduled=True))
+
+    async def fire(self, bot: Bot, threads: ThreadBindings, now: datetime) -> int:
+        """Напомнить о подошедших к now; возвращает число напоминаний."""
+        due = self.queue.pop_due(now)
+        if not due:
+            return 0
+        rows = await repo.due_reminders(due)
+        alive = {r["id"] for r in rows}
+        # закрытые/разобранные — снимаем с расписания (вернутся досинхронизацией, если освободятся)
+        updates: list[tuple[int, Any, int, Decimal | None]] = [
+            (aid, None, 0, None) for aid in due if aid not in alive
+        ]
+
+        topics: dict[tuple[int, int], list[dict[str, Any]]] = {}
+        for r in rows:
+            key = (int(r["published_chat_id"]), threads.get(r["work_type"]) or 0)
+            topics.setdefault(key, []).append(r)
+        me = await bot.me()
+        failed: set[int] = set()
+        for (chat_id, thread_id), items in topics.items():
+            for text, markup in render_pages(items, me.username):
+                try:
+                    await bot.send_message(
+                        chat_id, text, message_thread_id=thread_id or None, reply_markup=markup
+                    )
+                except Exception:
+                    logging.exception(
+                        "deadline reminders: send failed for chat=%s thread=%s", chat_id, thread_id
+                    )
+                    failed.update(r["id"] for r in items)
+                    break
+
+        for r in rows:
+            if r["id"] in failed:
+                # напоминание не дошло — счётчик и «свободно на прошлом напоминании» не трогаем
+                at: datetime | None = now + self.retry_delay
+                if r["deadline_at"] is not None and at >= _aware(r["deadline_at"]):
+                    at = None
+                updates.append((r["id"], at, r["remind_count"], r["last_remind_free"]))
+            else:
+                last_free = r["last_remind_free"]
+                claimed_since = last_free is not None and r["free_volume"] < last_free
+                streak = 0 if claimed_since else r["remind_count"] + 1
+                at = self.policy.next_at(now, r["deadline_at"], streak)
+                updates.append((r["id"], at, streak, r["free_volume"]))
+            if at is not None:
+                self.queue.schedule(r["id"], at)
+        await repo.save_reminder_schedule(updates)
+        self.reminded += len(rows) - len(failed)
+        self.retried += len(failed)
+        return len(rows) - len(failed)
+
+    async def _run(self, bot: Bot, threads: ThreadBindings, is_leader: Callable[[], bool]) -> None:
+        loaded = False
+        last_resync = self.clock.now()
+        while True:
+            try:
+                if not is_leader():
+                    loaded = False
+                    await self.clock.sleep(self.resync_every / 10)
+                    continue
+                if not loaded:
+                    # стали лидером — берём расписание из БД целиком
+                    await self.load()
+                    loaded, last_resync = True, self.clock.now()
+                elif (self.clock.now() - last_resync).total_seconds() >= self.resync_every:
+                    await self.resync()
+                    last_resync = self.clock.now()
+
+                now = self.clock.now()
+                head = self.queue.next_due()
+                if head is not None and head <= now:
+                    self.wakeups += 1
+                    await self.fire(bot, threads, now)
+                    continue
+                # спим до ближайшего срока, но не дольше интервала досинхронизации
+                delay = self.resync_every
+                if head is not None:
+                    delay = min(delay, (head - now).total_seconds())
+                await self.clock.sleep(max(delay, 0.0))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("deadline reminders: iteration failed")
+                loaded = False
+                await self.clock.sleep(self.resync_every / 10)
+
+    def start(
+        self,
+        bot: Bot,
+        threads: ThreadBindings,
+        is_leader: Callable[[], bool] = lambda: True,
+    ) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(
+                self._run(bot, threads, is_leader), name="deadline-reminders"
+            )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        head = self.queue.next_due()
+        return {
+            "scheduled": len(self.queue),
+            "next_due": head.isoformat(timespec="seconds") if head else "—",
+            "wakeups": self.wakeups,
+            "reminded": self.reminded,
+            "retried": self.retried,
+        }
@@ -0,0 +1,203 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError
+from aiogram.methods import (
+    SendMessage,
+    SendPhoto,
+    SendDocument,
+    CopyMessage,
+    ForwardMessage,
+    EditMessageText,
+    EditMessageReplyMarkup,
+    DeleteMessage,
+)
+from aiogram.methods.base import Response, TelegramMethod, TelegramType
+
+# Методы, которые Telegram лимитирует как «отправку в чат»
+_THROTTLED = (
+    SendMessage,
+    SendPhoto,
+    SendDocument,
+    CopyMessage,
+    ForwardMessage,
+    EditMessageText,
+    EditMessageReplyMarkup,
+    DeleteMessage,
+)
+
+# Повтор после сетевой ошибки безопасен только для идемпотентных методов:
+# отправка, которая «упала» по таймауту, могла дойти — повтор её задублирует
+_IDEMPOTENT = (
+    EditMessageText,
+    EditMessageReplyMarkup,
+    DeleteMessage,
+)
+
+
+class TokenBucket:
+    """
+    Классический token bucket: rate токенов в секунду, не больше capacity.
+    pause(seconds) — принудительная пауза (retry_after от Telegram).
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до следующего токена (0 — токен взят)."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        # проверка и списание без await между ними — атомарно в рамках event loop
+        while (wait := self.delay()) > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def idle(self) -> bool:
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Планировщик исходящих сообщений: request-middleware сессии бота.
+    Все send/edit/delete проходят через глобальный bucket, bucket чата
+    и ограниченный пул одновременных запросов. 429 переживаем по retry_after —
+    пауза и для чата, и для глобального bucket (flood-wait касается всего бота).
+    Сетевые ошибки повторяются только для правок и удалений: отправка по таймауту
+    могла дойти, и повтор дал бы дубль в чате.
+    """
+
+    # Лимиты Telegram: ~30 msg/s глобально, ~1 msg/s в личку, ~20 msg/min в группу
+    PRIVATE_RATE = 1.0
+    GROUP_RATE = 20 / 60
+    CHAT_BURST = 3
+    MAX_CHATS = 10_000
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        concurrency: int = 8,
+        max_retries: int = 10,
+    ) -> None:
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets: dict[int | str, TokenBucket] = {}
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+
+        # метрики
+        self.queued = 0
+        self.in_flight = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.latency_avg = 0.0  # EMA, сек
+        self.latency_max = 0.0
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= self.MAX_CHATS:
+                # выкидываем «полные» (простаивающие) bucket-ы
+                self.chat_buckets = {k: b for k, b in self.chat_buckets.items() if not b.idle()}
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.GROUP_RATE if is_group else self.PRIVATE_RATE
+            bucket = TokenBucket(rate, self.CHAT_BURST)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _observe(self, seconds: float) -> None:
+        self.latency_avg = seconds if self.sent == 0 else self.latency_avg * 0.9 + seconds * 0.1
+        self.latency_max = max(self.latency_max, seconds)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if not isinstance(method, _THROTTLED) or chat_id is None:
+            return await make_request(bot, method)
+
+        started = time.monotonic()
+        chat_bucket = self._chat_bucket(chat_id)
+        attempt = 0
+        self.queued += 1
+        try:
+            while True:
+                await chat_bucket.acquire()
+                await self.global_bucket.acquire()
+                async with self.semaphore:
+                    self.queued -= 1
+                    self.in_flight += 1
+                    try:
+                        response = await make_request(bot, method)
+                    except TelegramRetryAfter as e:
+                        attempt += 1
+                        if attempt > self.max_retries:
+                            self.failed += 1
+                            raise
+                        self.retried += 1
+                        logging.warning(
+                            "sender: 429 for chat=%s, retry in %ss", chat_id, e.retry_after
+                        )
+                        chat_bucket.pause(e.retry_after)
+                        self.global_bucket.pause(e.retry_after)
+                        continue
+                    except TelegramNetworkError:
+                        attempt += 1
+                        if not isinstance(method, _IDEMPOTENT) or attempt > self.max_retries:
+                            self.failed += 1
+                            raise
+                        self.retried += 1
+                        chat_bucket.pause(min(2 ** attempt, 30))
+                        continue
+                    except Exception:
+                        self.failed += 1
+                        raise
+                    finally:
+                        self.in_flight -= 1
+                        self.queued += 1
+
+                self._observe(time.monotonic() - started)
+                self.sent += 1
+                return response
+        finally:
+            self.queued -= 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "latency_avg_ms": round(self.latency_avg * 1000, 1),
+            "latency_max_ms": round(self.latency_max * 1000, 1),
+            "chats": len(self.chat_buckets),
+        }
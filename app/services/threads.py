@@ -0,0 +1,37 @@
+from __future__ import annotations
+import logging
+
+from ..config import get_config
+from ..db import repo
+
+
+class ThreadBindings:
+    """
+    Привязки work_type → message_thread_id в памяти.
+    Грузятся на старте, обновляются сразу после /bind_worktype и по
+    NOTIFY thread_bindings_changed с других реплик. Если привязки в БД нет —
+    берём THREADS_JSON из конфига (холодный старт / запасной вариант).
+    """
+
+    def __init__(self) -> None:
+        self._bindings: dict[str, int] = {}
+
+    async def load(self) -> None:
+        rows = await repo.list_thread_bindings()
+        self._bindings = {r["work_type"]: int(r["thread_id"]) for r in rows}
+        logging.info("thread bindings cache loaded: %d", len(self._bindings))
+
+    async def on_notify(self, payload: str | None) -> None:
+        # таблица крошечная — проще перечитать целиком
+        await self.load()
+
+    def set(self, work_type: str, thread_id: int) -> None:
+        bindings = dict(self._bindings)
+        bindings[work_type] = thread_id
+        self._bindings = bindings
+
+    def get(self, work_type: str) -> int | None:
+        thread_id = self._bindings.get(work_type)
+        if thread_id is None:
+            thread_id = get_config().threads_by_worktype.get(work_type)
+        return thread_id
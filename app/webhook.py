@@ -0,0 +1,62 @@
+# app/webhook.py
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from .config import Config
+
+
+async def _healthz(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def build_app(dp: Dispatcher, bot: Bot, cfg: Config) -> web.Application:
+    """
+    aiohttp-приложение для приёма апдейтов вебхуком.
+    Запрос проверяется по X-Telegram-Bot-Api-Secret-Token. Фоновую обработку
+    даёт LanedDispatcher: 200 уходит, как только апдейт встал в очередь,
+    а при полной очереди ответ задерживается — Telegram сбавляет темп.
+    GET /healthz — для балансировщика.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=cfg.webhook_secret,
+        handle_in_background=False,
+    ).register(app, path=cfg.webhook_path)
+    app.router.add_get("/healthz", _healthz)
+    # startup/shutdown диспетчера (в т.ч. storage.close()) — вместе с приложением
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, cfg: Config) -> None:
+    """
+    Регистрирует вебхук в Telegram и держит HTTP-сервер до отмены.
+    Реплик может быть несколько за одним балансировщиком: set_webhook
+    идемпотентен, а при остановке вебхук не снимается — его обслуживают остальные.
+    """
+    if not cfg.webhook_url or not cfg.webhook_secret:
+        raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_URL and WEBHOOK_SECRET")
+
+    runner = web.AppRunner(build_app(dp, bot, cfg))
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, cfg.webhook_host, cfg.webhook_port).start()
+        logging.info(
+            "Webhook server listening on %s:%s%s",
+            cfg.webhook_host, cfg.webhook_port, cfg.webhook_path,
+        )
+        await bot.set_webhook(
+            cfg.webhook_url.rstrip("/") + cfg.webhook_path,
+            secret_token=cfg.webhook_secret,
+            # chat_member Telegram присылает только по явному запросу в allowed_updates
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Накладные расходы AllMiddleware на апдейт:
+  locked     — прежний AllowedUsers: asyncio.Lock на каждую проверку;
+  cow-hit    — снимок copy-on-write, пользователь в кэше (основной путь);
+  cow-neg    — не участник, ответ из отрицательного кэша;
+  cow-miss   — не участник, промах — запрос в БД (раз в negative_ttl на пользователя).
+Запускать из корня проекта (миграции уже применены):
+    python -m bench.allowed_middleware --updates 100000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from aiogram.types import Chat, Message, User
+
+from app.config import get_config
+from app.db.pool import init_pool, close_pool
+from app.middlewares.members import AllMiddleware
+from app.services.allowed import AllowedUsers
+
+MEMBER_ID = 9_000_000_000_201     # заведомо не telegram-id
+STRANGER_ID = 9_000_000_000_202
+
+
+class LockedAllowedUsers:
+    """Прежняя реализация — для сравнения."""
+
+    def __init__(self, ids: list[int]) -> None:
+        self._ids = set(ids)
+        self._lock = asyncio.Lock()
+
+    async def contains(self, user_id: int) -> bool:
+        async with self._lock:
+            return user_id in self._ids
+
+
+def _message(uid: int) -> Message:
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=-100, type="supergroup"),
+        from_user=User(id=uid, is_bot=False, first_name="bench"),
+        text="hello",
+    )
+
+
+async def _handler(event, data) -> None:
+    return None
+
+
+async def measure(name: str, middleware: AllMiddleware, event: Message, updates: int) -> None:
+    data = {"config": SimpleNamespace(admins=frozenset())}
+    await middleware(_handler, event, data)  # прогрев
+    t0 = time.perf_counter()
+    for _ in range(updates):
+        await middleware(_handler, event, data)
+    elapsed = time.perf_counter() - t0
+    print(f"{name:>9}: {elapsed / updates * 1e6:7.2f} µs/update")
+
+
+async def run(updates: int) -> None:
+    await init_pool(get_config().db_dsn, max_size=2)
+    try:
+        members = list(range(1, 5001)) + [MEMBER_ID]
+        cow = AllowedUsers()
+        await cow.load(members)
+        member, stranger = _message(MEMBER_ID), _message(STRANGER_ID)
+
+        await measure("locked", AllMiddleware(LockedAllowedUsers(members)), member, updates)
+        await measure("cow-hit", AllMiddleware(cow), member, updates)
+        await measure("cow-neg", AllMiddleware(cow), stranger, updates)
+
+        cold = AllowedUsers(negative_ttl=0)  # каждый промах — в БД
+        await cold.load(members)
+        await measure("cow-miss", AllMiddleware(cold), stranger, max(updates // 100, 10))
+        print("stats:", cow.stats())
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--updates", type=int, default=100_000)
+    a = p.parse_args()
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(run(a.updates))
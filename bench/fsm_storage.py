@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Накладные расходы FSM-хранилища на один апдейт сценария создания задания.
+Апдейт моделируется как в aiogram: get_state (FSMContextMiddleware),
+затем в обработчике update_data + set_state, иногда get_data.
+Сравниваются:
+  memory     — MemoryStorage;
+  pg-cached  — PgStorage с кэшем (как в проде);
+  pg-nocache — PgStorage с cache_ttl=0: каждое чтение чистой записи — в БД.
+В конце — проверка долговечности: новый экземпляр PgStorage читает то,
+что записал предыдущий (в том числе Decimal и datetime).
+Запускать из корня проекта (миграции уже применены):
+    python -m bench.fsm_storage --users 50 --updates 6
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from app.config import get_config
+from app.db.pool import init_pool, get_pool, close_pool
+from app.fsm.pg_storage import PgStorage
+from app.fsm.task_creation import TaskCreation
+
+BENCH_BOT_ID = 1
+BENCH_USER_BASE = 9_000_000_000_100  # заведомо не telegram-id
+
+_STEPS = [
+    (TaskCreation.deadline, {"work_type": "design"}),
+    (TaskCreation.project, {"deadline": datetime(2030, 1, 1, tzinfo=timezone.utc)}),
+    (TaskCreation.customer, {"project": "bench-fsm"}),
+    (TaskCreation.total_volume, {"customer_id": 1}),
+    (TaskCreation.comment, {"total_volume": Decimal("12.5")}),
+    (None, {"comment": "done"}),
+]
+
+
+def _key(i: int) -> StorageKey:
+    uid = BENCH_USER_BASE + i
+    return StorageKey(bot_id=BENCH_BOT_ID, chat_id=uid, user_id=uid)
+
+
+async def update(storage: BaseStorage, key: StorageKey, step: int) -> None:
+    state, patch = _STEPS[step % len(_STEPS)]
+    await storage.get_state(key)
+    await storage.update_data(key, patch)
+    await storage.set_state(key, state)
+    if state is None:
+        await storage.get_data(key)
+
+
+async def measure(name: str, storage: BaseStorage, users: int, updates: int) -> None:
+    keys = [_key(i) for i in range(users)]
+    t0 = time.perf_counter()
+    # пользователи идут параллельно, апдейты одного пользователя — по порядку
+    await asyncio.gather(*(
+        _user_flow(storage, k, updates) for k in keys
+    ))
+    elapsed = time.perf_counter() - t0
+    await storage.close()
+    total = users * updates
+    print(f"{name:>10}: {elapsed / total * 1e6:8.1f} µs/update ({total} updates)")
+
+
+async def _user_flow(storage: BaseStorage, key: StorageKey, updates: int) -> None:
+    for step in range(updates):
+        await update(storage, key, step)
+
+
+async def durability() -> None:
+    key = _key(0)
+    first = PgStorage()
+    await first.set_state(key, TaskCreation.comment)
+    await first.update_data(
+        key, {"total_volume": Decimal("3.25"), "deadline": datetime(2030, 1, 1)}
+    )
+    await first.close()
+
+    second = PgStorage()
+    state, data = await second.get_state(key), await second.get_data(key)
+    await second.close()
+    ok = state == TaskCreation.comment.state and data == {
+        "total_volume": Decimal("3.25"), "deadline": datetime(2030, 1, 1),
+    }
+    print(f"durability: {'ok' if ok else 'FAILED'} (state={state!r}, data={data!r})")
+
+
+async def run(users: int, updates: int) -> None:
+    await init_pool(get_config().db_dsn, max_size=10)
+    try:
+        await measure("memory", MemoryStorage(), users, updates)
+        await measure("pg-cached", PgStorage(), users, updates)
+        await measure("pg-nocache", PgStorage(cache_ttl=0), users, updates)
+        await durability()
+    finally:
+        async with get_pool().connection() as conn:
+            await conn.execute("DELETE FROM fsm_storage WHERE key LIKE %s", (f"{BENCH_BOT_ID}:%",))
+        await close_pool()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--users", type=int, default=50)
+    p.add_argument("--updates", type=int, default=6)
+    a = p.parse_args()
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(run(a.users, a.updates))
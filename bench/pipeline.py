@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Микро-бенчмарк сценария «создать задание перед публикацией»:
+  before    — get_customer_name, create_assignment, thread_id_for_worktype отдельными запросами;
+  pipeline  — те же три запроса одним пакетом (pipeline mode + prepared);
+  cached    — как сейчас в finalize_task: только create_assignment, имя и тема из кэшей.
+Между ботом и Postgres ставится TCP-прокси с искусственной задержкой,
+прокси же считает пакеты клиент→сервер (≈ round trips).
+Запускать из корня проекта на ОТДЕЛЬНОЙ (не боевой) БД — миграции применяются сами,
+тестовый пользователь и задания удаляются в конце:
+    python -m bench.pipeline --dsn postgresql://127.0.0.1:5432/taskbot_bench --delay-ms 20
+"""
+import argparse
+import asyncio
+import sys
+import time
+from decimal import Decimal
+
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+from app.db.pool import init_pool, get_pool, close_pool
+from app.db.migrate import apply_migrations
+from app.db import repo
+
+BENCH_USER_ID = 9_000_000_000_001  # заведомо не telegram-id
+
+
+class DelayProxy:
+    """TCP-прокси: задержка delay в каждую сторону, счётчик пакетов клиента."""
+
+    def __init__(self, target_host: str, target_port: int, delay: float) -> None:
+        self.target = (target_host, target_port)
+        self.delay = delay
+        self.client_writes = 0
+        self.server: asyncio.base_events.Server | None = None
+
+    async def _pipe(self, reader, writer, from_client: bool) -> None:
+        try:
+            while data := await reader.read(65536):
+                if from_client:
+                    self.client_writes += 1
+                await asyncio.sleep(self.delay)
+                writer.write(data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _handle(self, c_reader, c_writer) -> None:
+        s_reader, s_writer = await asyncio.open_connection(*self.target)
+        await asyncio.gather(
+            self._pipe(c_reader, s_writer, True),
+            self._pipe(s_reader, c_writer, False),
+            return_exceptions=True,
+        )
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+
+async def before(args: dict) -> None:
+    async with get_pool().connection() as conn:
+        await repo.get_customer_name(args["customer_id"], conn=conn)
+        await repo.create_assignment(**args, conn=conn)
+        await repo.thread_id_for_worktype(args["work_type"], conn=conn)
+
+
+async def pipeline(args: dict) -> None:
+    async with get_pool().connection() as conn:
+        async with conn.pipeline():
+            c1 = await conn.execute(
+                "SELECT name FROM customers WHERE id = %s", (args["customer_id"],), prepare=True
+            )
+            c2 = await conn.execute(
+                repo._CREATE_ASSIGNMENT_SQL,
+                (args["author_id"], args["work_type"], args["deadline_at"], args["project"],
+                 args["customer_id"], args["customer_id"], args["total_volume"], args["comment"]),
+                prepare=True,
+            )
+            c3 = await conn.execute(
+                repo._THREAD_FOR_WORKTYPE_SQL, (args["work_type"],), prepare=True
+            )
+        for cur in (c1, c2, c3):
+            await cur.fetchall()
+
+
+async def cached(args: dict) -> None:
+    async with get_pool().connection() as conn:
+        await repo.create_assignment(**args, conn=conn)
+
+
+async def measure(name: str, fn, args: dict, proxy: DelayProxy, iterations: int) -> None:
+    await fn(args)  # прогрев: соединение, prepare
+    writes0, t0 = proxy.client_writes, time.perf_counter()
+    for _ in range(iterations):
+        await fn(args)
+    elapsed = time.perf_counter() - t0
+    per_op = (proxy.client_writes - writes0) / iterations
+    print(f"{name:>8}: {elapsed / iterations * 1000:7.1f} ms/op, ~{per_op:.1f} client packets/op")
+
+
+async def run(dsn: str, delay_ms: float, iterations: int) -> None:
+    params = conninfo_to_dict(dsn)
+    db_host, db_port = params.get("host") or "127.0.0.1", int(params.get("port") or 5432)
+    proxy = DelayProxy(db_host, db_port, delay_ms / 1000)
+    port = await proxy.start()
+    await init_pool(make_conninfo(dsn, host="127.0.0.1", port=port))
+    try:
+        await apply_migrations()
+        # не участник: аудит и кэши членства его не касаются
+        await repo.upsert_user(BENCH_USER_ID, "bench", "bench", False, False)
+        customers = await repo.list_customers()
+        args = dict(
+            author_id=BENCH_USER_ID,
+            work_type="design",
+            deadline_at=None,
+            project="bench-pipeline",
+            customer_id=customers[0]["id"] if customers else None,
+            total_volume=Decimal(1),
+            comment=None,
+        )
+        print(f"delay {delay_ms} ms each way, {iterations} iterations")
+        await measure("before", before, args, proxy, iterations)
+        await measure("pipeline", pipeline, args, proxy, iterations)
+        await measure("cached", cached, args, proxy, iterations)
+    finally:
+        async with get_pool().connection() as conn:
+            await conn.execute("DELETE FROM assignments WHERE author_id = %s", (BENCH_USER_ID,))
+            await conn.execute("DELETE FROM users WHERE id = %s", (BENCH_USER_ID,))
+        await close_pool()
+        proxy.server.close()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--dsn", required=True, help="DSN отдельной БД для замеров (не боевой)")
+    p.add_argument("--delay-ms", type=float, default=20)
+    p.add_argument("--iterations", type=int, default=50)
+    a = p.parse_args()
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(run(a.dsn, a.delay_ms, a.iterations))
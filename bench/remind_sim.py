@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+Симуляция планировщика напоминаний (REMIND_MODE=deadline) на виртуальных часах.
+1) RemindPolicy + ReminderQueue без БД и Telegram. «Сон до ближайшего срока» —
+прыжок часов к queue.next_due(). Проверяются инварианты (падает с AssertionError):
+  - после срока задания напоминаний нет;
+  - без взятий интервалы не растут по мере приближения срока сильнее, чем разрешает политика;
+  - за пробуждение обрабатываются ровно подошедшие задания: у каждого снятого
+    срок ≤ now, а в очереди не остаётся ни одного со сроком ≤ now;
+  - разобранные задания снимаются с расписания.
+И сравнивается число напоминаний с интервальным режимом (каждые --interval-min минут по всем).
+2) DeadlineReminders целиком (_run/fire) на поддельных часах (Clock.sleep двигает
+время и применяет события мира), репозитории в памяти и боте, у которого
+часть отправок падает; лидерство периодически переходит к «другому экземпляру».
+Проверяется:
+  - напоминания уходят только от лидера, только по открытым заданиям и до срока;
+  - не дошедшее напоминание повторяется через retry_delay, remind_count
+    и last_remind_free не меняются;
+  - после взятия (свободный объём уменьшился) серия сбрасывается в 0, иначе растёт на 1;
+  - после возврата лидерства очередь совпадает с расписанием из БД
+    (save_reminder_schedule действительно сохранил его);
+  - досинхронизация не переписывает задания, которым напоминать уже поздно.
+    python -m bench.remind_sim --assignments 200 --days 3
+"""
+import argparse
+import asyncio
+import logging
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any
+
+from app.services import remind_scheduler
+from app.services.remind_scheduler import DeadlineReminders, RemindPolicy, ReminderQueue
+
+
+def simulate(n: int, days: float, interval_min: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=days)
+    policy = RemindPolicy()
+    queue = ReminderQueue()
+
+    deadline: dict[int, datetime | None] = {}
+    claimed_at: dict[int, datetime] = {}   # когда задание разберут целиком
+    streak: dict[int, int] = {}
+    sent: dict[int, list[datetime]] = {}
+    planned: dict[int, datetime] = {}      # последнее время, переданное в queue.schedule
+
+    for aid in range(1, n + 1):
+        created = start + timedelta(minutes=rnd.randrange(0, int(days * 24 * 60 / 2)))
+        deadline[aid] = None
+        if rnd.random() >= 0.2:
+            deadline[aid] = created + timedelta(hours=rnd.uniform(2, 72))
+        if rnd.random() < 0.5:
+            claimed_at[aid] = created + timedelta(hours=rnd.uniform(0.5, 48))
+        streak[aid] = 0
+        sent[aid] = []
+        at = policy.next_at(created, deadline[aid], 0)
+        if at is not None:
+            queue.schedule(aid, at)
+            planned[aid] = at
+
+    now, wakeups, processed = start, 0, 0
+    while (head := queue.next_due()) is not None and head <= end:
+        now = max(now, head)  # «спим» до ближайшего
+        due = queue.pop_due(now)
+        assert due, "woke up with nothing due"
+        for aid in due:
+            assert planned.pop(aid) <= now, f"#{aid} popped before its due time"
+        rest = queue.next_due()
+        assert rest is None or rest > now, "due items left in the queue after wake-up"
+        wakeups += 1
+        processed += len(due)
+        for aid in due:
+            if aid in claimed_at and claimed_at[aid] <= now:
+                continue  # разобрано — с расписания снято
+            dl = deadline[aid]
+            assert dl is None or now < dl + timedelta(seconds=1), f"#{aid} reminded after deadline"
+            sent[aid].append(now)
+            streak[aid] += 1
+            at = policy.next_at(now, dl, streak[aid])
+            if at is not None:
+                assert at - now >= policy.min_interval - timedelta(seconds=1)
+                assert at - now <= policy.max_interval + timedelta(seconds=1)
+                queue.schedule(aid, at)
+                planned[aid] = at
+
+    # интервальный режим: каждый тик — напоминание по каждому открытому до срока заданию
+    baseline = 0
+    t = start
+    while t <= end:
+        for aid in deadline:
+            open_ = not (aid in claimed_at and claimed_at[aid] <= t)
+            before_deadline = deadline[aid] is None or t < deadline[aid]
+            baseline += open_ and before_deadline
+        t += timedelta(minutes=interval_min)
+
+    total = sum(len(v) for v in sent.values())
+    print(f"{n} assignments over {days} days")
+    print(f"deadline mode: {total} reminders, {wakeups} wake-ups, {processed} items processed")
+    print(f"interval mode (every {interval_min} min): {baseline} reminders")
+    print("ok")
+
+
+class _World:
+    """Задания в памяти + события (публикация, взятия, смена лидера) по виртуальному времени."""
+
+    def __init__(self, n: int, days: float, fail_rate: float, leader_flips: int, seed: int) -> None:
+        self.rnd = random.Random(seed)
+        self.start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        self.end = self.start + timedelta(days=days)
+        self.now = self.start
+        self.fail_rate = fail_rate
+        self.leader = True
+        self.rows: dict[int, dict[str, Any]] = {}
+        self.events: list[tuple[datetime, int, str, int]] = []  # (время, порядок, вид, id)
+        self.violations: list[str] = []
+        self.sends = self.failures = self.claims = self.regains = 0
+
+        for aid in range(1, n + 1):
+            created = self.start + timedelta(minutes=self.rnd.randrange(0, int(days * 24 * 60 / 2)))
+            deadline = None
+            if self.rnd.random() >= 0.2:
+                deadline = created + timedelta(hours=self.rnd.uniform(2, 72))
+            self.rows[aid] = {
+                "id": aid, "work_type": "design", "published_chat_id": -100 - aid % 3,
+                "free_volume": Decimal(10), "deadline_at": deadline,
+                "is_active": True, "created": created,
+                "next_remind_at": None, "remind_count": 0, "last_remind_free": None,
+            }
+            for _ in range(self.rnd.randrange(0, 4)):
+                self._event(created + timedelta(hours=self.rnd.uniform(0.5, 48)), "claim", aid)
+        for i in range(leader_flips):
+            at = self.start + (self.end - self.start) * (i + 1) / (leader_flips + 1)
+            self._event(at, "flip", 0)
+        self.events.sort()
+
+    def _event(self, at: datetime, kind: str, aid: int) -> None:
+        self.events.append((at, len(self.events), kind, aid))
+
+    def advance(self, to: datetime) -> None:
+        while self.events and self.events[0][0] <= to:
+            _, _, kind, aid = self.events.pop(0)
+            if kind == "claim":
+                r = self.rows[aid]
+                r["free_volume"] = max(Decimal(0), r["free_volume"] - self.rnd.choice([1, 3, 10]))
+                self.claims += 1
+            else:
+                self.leader = not self.leader
+                self.regains += self.leader
+        self.now = to
+
+    def is_open(self, r: dict[str, Any]) -> bool:
+        return (
+            r["created"] <= self.now and r["is_active"] and r["free_volume"] > 0
+            and (r["deadline_at"] is None or r["deadline_at"] > self.now)
+        )
+
+
+class _FakeClock:
+    def __init__(self, world: _World) -> None:
+        self.world = world
+        self.finished = asyncio.Event()
+
+    def now(self) -> datetime:
+        return self.world.now
+
+    async def sleep(self, seconds: float) -> None:
+        if self.world.now >= self.world.end:
+            # виртуальное время вышло — засыпаем до stop()
+            self.finished.set()
+            await asyncio.Future()
+        self.world.advance(min(self.world.now + timedelta(seconds=seconds), self.world.end))
+        await asyncio.sleep(0)
+
+
+class _FakeRepo:
+    """Те же выборки, что и SQL в app.db.repo, плюс проверка каждой записи расписания."""
+
+    def __init__(self, world: _World, retry_delay: timedelta) -> None:
+        self.world = world
+        self.retry_delay = retry_delay
+        self.firing: dict[int, dict[str, Any]] | None = None  # снимок строк текущего fire
+        self.failed_chats: set[int] = set()
+
+    async def list_reminder_schedule(self, only_unscheduled: bool = False) -> list[dict[str, Any]]:
+        return [
+            dict(r) for r in self.world.rows.values()
+            if self.world.is_open(r) and not (only_unscheduled and r["next_remind_at"] is not None)
+        ]
+
+    async def due_reminders(self, assignment_ids: list[int]) -> list[dict[str, Any]]:
+        rows = [self.world.rows[a] for a in assignment_ids]
+        # в SQL срок не фильтруется — только открытость; «после срока» ловит бот
+        rows = [dict(r) for r in rows if r["is_active"] and r["free_volume"] > 0]
+        self.firing = {r["id"]: r for r in rows}
+        self.failed_chats = set()
+        return rows
+
+    async def save_reminder_schedule(
+        self,
+        items: list[tuple[int, Any, int, Decimal | None]],
+    ) -> None:
+        for aid, at, cnt, free in items:
+            self._check(aid, at, cnt, free)
+            r = self.world.rows[aid]
+            r["next_remind_at"], r["remind_count"], r["last_remind_free"] = at, cnt, free
+        self.firing = None
+
+    def _check(self, aid: int, at: datetime | None, cnt: int, free: Decimal | None) -> None:
+        w, prev = self.world, self.firing and self.firing.get(aid)
+        if self.firing is None:
+            # _plan: только первое время, без сброса уже сохранённого расписания
+            if at is None or cnt != 0 or free is not None:
+                w.violations.append(f"#{aid}: plan wrote ({at}, {cnt}, {free})")
+            return
+        if not prev:
+            if at is not None:
+                w.violations.append(f"#{aid}: closed assignment kept on schedule")
+            return
+        if prev["published_chat_id"] in self.failed_chats:
+            if (cnt, free) != (prev["remind_count"], prev["last_remind_free"]):
+                w.violations.append(f"#{aid}: failed send changed remind_count/last_remind_free")
+            if at is not None and at != w.now + self.retry_delay:
+                w.violations.append(f"#{aid}: failed send retried at {at}")
+            return
+        last_free = prev["last_remind_free"]
+        claimed = last_free is not None and prev["free_volume"] < last_free
+        expected = 0 if claimed else prev["remind_count"] + 1
+        if (cnt, free) != (expected, prev["free_volume"]):
+            w.violations.append(f"#{aid}: streak {cnt} after send, expected {expected}")
+
+
+class _FakeBot:
+    def __init__(self, world: _World, repo: _FakeRepo) -> None:
+        self.world, self.repo = world, repo
+
+    async def me(self) -> SimpleNamespace:
+        return SimpleNamespace(username="sim_bot")
+
+    async def send_message(self, chat_id: int, text: str, **_: Any) -> None:
+        w = self.world
+        if not w.leader:
+            w.violations.append(f"sent to {chat_id} while not leader")
+        for aid in map(int, re.findall(r"^#(\d+)", text, re.M)):
+            if not w.is_open(w.rows[aid]):
+                w.violations.append(f"#{aid} reminded while closed or after deadline")
+        if w.rnd.random() < w.fail_rate:
+            self.repo.failed_chats.add(chat_id)
+            w.failures += 1
+            raise RuntimeError("simulated send failure")
+        w.sends += 1
+
+
+class _NoThreads:
+    def get(self, work_type: str) -> int | None:
+        return None
+
+
+class _IterationFailures(logging.Handler):
+    """Сбои отправки ожидаемы и логируются сервисом; сбой итерации _run — нет."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.ERROR)
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if "iteration failed" in record.getMessage():
+            self.records.append(record)
+
+
+async def _run_service(world: _World) -> DeadlineReminders:
+    clock = _FakeClock(world)
+    svc = DeadlineReminders(RemindPolicy(), clock=clock)
+    fake = _FakeRepo(world, svc.retry_delay)
+    load = svc.load
+
+    async def checked_load() -> None:
+        # после (пере)захвата лидерства очередь должна совпасть с расписанием в БД
+        await load()
+        in_db = sum(
+            1 for r in world.rows.values()
+            if world.is_open(r) and r["next_remind_at"] is not None
+        )
+        if len(svc.queue) != in_db:
+            world.violations.append(
+                f"{world.now}: queue has {len(svc.queue)} items after load, DB {in_db}"
+            )
+
+    svc.load = checked_load
+    real_repo, remind_scheduler.repo = remind_scheduler.repo, fake
+    try:
+        svc.start(_FakeBot(world, fake), _NoThreads(), lambda: world.leader)
+        await clock.finished.wait()
+        await svc.stop()
+    finally:
+        remind_scheduler.repo = real_repo
+    return svc
+
+
+def simulate_service(n: int, days: float, fail_rate: float, leader_flips: int, seed: int) -> None:
+    world = _World(n, days, fail_rate, leader_flips, seed)
+    failures = _IterationFailures()
+    root = logging.getLogger()
+    root.addHandler(failures)  # вместо вывода в stderr
+    try:
+        svc = asyncio.run(_run_service(world))
+    finally:
+        root.removeHandler(failures)
+    print(
+        f"service: {svc.reminded} reminded, {svc.retried} retried, {svc.wakeups} wake-ups, "
+        f"{world.claims} claims, {world.regains} leadership regains"
+    )
+    for v in world.violations[:20]:
+        print("  violation:", v)
+    assert not failures.records, f"{len(failures.records)} iterations failed"
+    assert not world.violations, f"{len(world.violations)} violations"
+    assert svc.retried and world.regains, "simulation did not exercise retries or failover"
+    print("ok")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--assignments", type=int, default=200)
+    p.add_argument("--days", type=float, default=3)
+    p.add_argument("--interval-min", type=int, default=2)
+    p.add_argument(
+        "--fail-rate", type=float, default=0.1,
+        help="доля отправок, падающих в симуляции сервиса",
+    )
+    p.add_argument("--leader-flips", type=int, default=6)
+    p.add_argument("--seed", type=int, default=1)
+    a = p.parse_args()
+    simulate(a.assignments, a.days, a.interval_min, a.seed)
+    simulate_service(a.assignments, a.days, a.fail_rate, a.leader_flips, a.seed)
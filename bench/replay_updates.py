@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Прогон записанных апдейтов через локальный вебхук-сервер (BOT_MODE=webhook).
+Файл — JSON-массив апдейтов или по одному апдейту в строке (как их отдаёт getUpdates).
+Печатает коды ответов и время подтверждения (сервер отвечает 200 до обработки),
+а также проверяет, что запрос с неверным секретом отклоняется.
+Запускать из корня проекта при работающем боте:
+    python -m bench.replay_updates updates.jsonl --concurrency 20 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+
+from aiohttp import ClientSession
+
+from app.config import get_config
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def load_updates(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def run(path: str, url: str, concurrency: int, repeat: int) -> None:
+    cfg = get_config()
+    updates = load_updates(path) * repeat
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses: Counter[int] = Counter()
+    latencies: list[float] = []
+
+    async with ClientSession() as http:
+        headers = {SECRET_HEADER: cfg.webhook_secret}
+
+        async def post(update: dict) -> None:
+            async with semaphore:
+                t0 = time.perf_counter()
+                async with http.post(url, json=update, headers=headers) as resp:
+                    await resp.read()
+                    statuses[resp.status] += 1
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(post(u) for u in updates))
+        elapsed = time.perf_counter() - t0
+
+        probe = updates[0] if updates else {}
+        async with http.post(url, json=probe, headers={SECRET_HEADER: "wrong"}) as resp:
+            bad_secret = resp.status
+
+    latencies.sort()
+    print(f"{len(updates)} updates in {elapsed:.2f}s ({len(updates) / elapsed:.0f}/s), "
+          f"statuses: {dict(statuses)}")
+    if latencies:
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        p50 = statistics.median(latencies)
+        print(f"ack latency: p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms")
+    print(f"wrong secret → {bad_secret} ({'ok' if bad_secret == 401 else 'UNEXPECTED'})")
+
+
+if __name__ == "__main__":
+    cfg = get_config()
+    p = argparse.ArgumentParser()
+    p.add_argument("updates", help="файл с записанными апдейтами (JSON-массив или JSON lines)")
+    p.add_argument("--url", default=f"http://127.0.0.1:{cfg.webhook_port}{cfg.webhook_path}")
+    p.add_argument("--concurrency", type=int, default=20)
+    p.add_argument("--repeat", type=int, default=1)
+    a = p.parse_args()
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(run(a.updates, a.url, a.concurrency, a.repeat))
@@ -0,0 +1,46 @@
+-- Базовая схема. IF NOT EXISTS — чтобы на уже развёрнутой БД миграция ничего не меняла.
+
+CREATE TABLE IF NOT EXISTS users (
+    id         bigint PRIMARY KEY,
+    username   text,
+    full_name  text,
+    is_admin   boolean NOT NULL DEFAULT false,
+    is_member  boolean NOT NULL DEFAULT false,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS customers (
+    id        serial PRIMARY KEY,
+    name      text NOT NULL UNIQUE,
+    is_active boolean NOT NULL DEFAULT true
+);
+
+CREATE TABLE IF NOT EXISTS assignments (
+    id                     bigserial PRIMARY KEY,
+    author_id              bigint NOT NULL,
+    work_type              text NOT NULL,
+    deadline_at            timestamp,
+    project                text,
+    customer_id            integer REFERENCES customers (id) ON DELETE SET NULL,
+    customer_name_snapshot text,
+    total_volume           numeric NOT NULL,
+    comment                text,
+    is_active              boolean NOT NULL DEFAULT true,
+    published_chat_id      bigint,
+    published_message_id   bigint,
+    created_at             timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS task_claims (
+    id            bigserial PRIMARY KEY,
+    assignment_id bigint NOT NULL REFERENCES assignments (id) ON DELETE CASCADE,
+    executor_id   bigint NOT NULL,
+    volume        numeric NOT NULL,
+    done          boolean NOT NULL DEFAULT false,
+    created_at    timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS thread_bindings (
+    work_type text PRIMARY KEY,
+    thread_id bigint NOT NULL
+);
@@ -0,0 +1,33 @@
+-- Начальный справочник заказчиков — одним INSERT и только в пустую таблицу
+-- (удалённых вручную заказчиков не возвращаем).
+
+INSERT INTO customers (name)
+SELECT v.name FROM (VALUES
+    ('Администрация Главы Чувашии'),
+    ('Глава Чувашии'),
+    ('Госпаблики'),
+    ('Госпаблики детских садов'),
+    ('Госпаблики ОМСУ'),
+    ('Госпаблики школ'),
+    ('Кабмин Чувашии'),
+    ('Медиацентр Чувашии'),
+    ('Минздрав Чувашии'),
+    ('Минкультуры Чувашии'),
+    ('Минобразования Чувашии'),
+    ('Минсельхоз Чувашии'),
+    ('Минспорт Чувашии'),
+    ('Минстрой Чувашии'),
+    ('Минтруд Чувашии'),
+    ('Минцифры Чувашии'),
+    ('Минэкономразвития Чувашии'),
+    ('Молодежная политика'),
+    ('Фонд защитников отечества'),
+    ('ЦУР Чувашии'),
+    ('Военкомат Чувашии'),
+    ('Госветслужба'),
+    ('Госпаблик Чебоксары'),
+    ('Госпаблики спортивных школ'),
+    ('Минтранс Чувашии')
+) AS v(name)
+WHERE NOT EXISTS (SELECT 1 FROM customers)
+ON CONFLICT (name) DO NOTHING;
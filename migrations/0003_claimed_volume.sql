@@ -0,0 +1,46 @@
+-- Поддерживаемый счётчик занятого объёма по заданию.
+-- claimed_volume = SUM(task_claims.volume) по незакрытым (done = false) захватам,
+-- free_volume = total_volume - claimed_volume. Счётчик ведёт триггер на task_claims.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'assignments' AND column_name = 'claimed_volume'
+    ) THEN
+        ALTER TABLE assignments ADD COLUMN claimed_volume numeric NOT NULL DEFAULT 0;
+        ALTER TABLE assignments
+            ADD COLUMN free_volume numeric GENERATED ALWAYS AS (total_volume - claimed_volume) STORED;
+
+        UPDATE assignments a
+        SET claimed_volume = s.taken
+        FROM (
+            SELECT assignment_id, SUM(volume) AS taken
+            FROM task_claims
+            WHERE done = false
+            GROUP BY assignment_id
+        ) s
+        WHERE s.assignment_id = a.id;
+    END IF;
+END $$;
+
+CREATE OR REPLACE FUNCTION task_claims_track_claimed_volume() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND NOT OLD.done THEN
+        UPDATE assignments SET claimed_volume = claimed_volume - OLD.volume WHERE id = OLD.assignment_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NOT NEW.done THEN
+        UPDATE assignments SET claimed_volume = claimed_volume + NEW.volume WHERE id = NEW.assignment_id;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS task_claims_claimed_volume ON task_claims;
+CREATE TRIGGER task_claims_claimed_volume
+    AFTER INSERT OR DELETE OR UPDATE OF volume, done, assignment_id ON task_claims
+    FOR EACH ROW EXECUTE FUNCTION task_claims_track_claimed_volume();
+
+-- открытые задания со свободным объёмом (напоминания)
+CREATE INDEX IF NOT EXISTS assignments_open_free_idx
+    ON assignments (created_at DESC)
+    WHERE is_active AND free_volume > 0;
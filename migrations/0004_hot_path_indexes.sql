@@ -0,0 +1,20 @@
+-- Индексы под запросы app/db/repo.py (проверка планов: python -m bench.query_plans).
+
+-- открытые захваты по заданию: триггер claimed_volume, rebuild_claimed_volume,
+-- каскадное удаление задания (index-only по volume)
+CREATE INDEX IF NOT EXISTS task_claims_assignment_idx
+    ON task_claims (assignment_id, done) INCLUDE (volume);
+
+-- «📋 Мои задачи»: открытые захваты исполнителя, новые сверху
+CREATE INDEX IF NOT EXISTS task_claims_executor_open_idx
+    ON task_claims (executor_id, created_at DESC)
+    WHERE done = false;
+
+-- «📤 Мои выданные задания»
+CREATE INDEX IF NOT EXISTS assignments_author_created_idx
+    ON assignments (author_id, created_at DESC);
+
+-- активные задания, новые сверху (LIMIT 100)
+CREATE INDEX IF NOT EXISTS assignments_active_created_idx
+    ON assignments (created_at DESC)
+    WHERE is_active;
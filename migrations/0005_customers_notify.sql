@@ -0,0 +1,13 @@
+-- Любое изменение справочника заказчиков → NOTIFY customers_changed
+-- (кэш CustomerDirectory на всех репликах перечитывает справочник).
+
+CREATE OR REPLACE FUNCTION notify_customers_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('customers_changed', '');
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS customers_changed ON customers;
+CREATE TRIGGER customers_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON customers
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_customers_changed();
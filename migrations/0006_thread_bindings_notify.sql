@@ -0,0 +1,13 @@
+-- Изменение привязок work_type → тема → NOTIFY thread_bindings_changed
+-- (payload — work_type; кэш ThreadBindings на всех репликах перечитывает привязки).
+
+CREATE OR REPLACE FUNCTION notify_thread_bindings_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('thread_bindings_changed', COALESCE(NEW.work_type, OLD.work_type));
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS thread_bindings_changed ON thread_bindings;
+CREATE TRIGGER thread_bindings_changed
+    AFTER INSERT OR UPDATE OR DELETE ON thread_bindings
+    FOR EACH ROW EXECUTE FUNCTION notify_thread_bindings_changed();
@@ -0,0 +1,11 @@
+-- Хранилище FSM (состояние и данные незавершённых сценариев) — переживает рестарт
+-- и общее для всех реплик. Пустые записи (нет состояния и данных) удаляются.
+
+CREATE TABLE IF NOT EXISTS fsm_storage (
+    key        text PRIMARY KEY,
+    state      text,
+    data       jsonb NOT NULL DEFAULT '{}'::jsonb,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS fsm_storage_updated_idx ON fsm_storage (updated_at);
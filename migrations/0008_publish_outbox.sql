@@ -0,0 +1,28 @@
+-- Outbox публикаций: строка пишется в одной транзакции с заданием,
+-- фоновый OutboxDispatcher забирает строки (FOR UPDATE SKIP LOCKED),
+-- публикует в общий чат и удаляет строку вместе с записью published_* в assignments.
+
+CREATE TABLE IF NOT EXISTS publish_outbox (
+    id              bigserial PRIMARY KEY,
+    assignment_id   bigint NOT NULL REFERENCES assignments (id) ON DELETE CASCADE,
+    chat_id         bigint NOT NULL,
+    payload         jsonb NOT NULL,
+    attempts        integer NOT NULL DEFAULT 0,
+    next_attempt_at timestamptz NOT NULL DEFAULT now(),
+    last_error      text,
+    created_at      timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS publish_outbox_due_idx ON publish_outbox (next_attempt_at, id);
+
+-- Будим диспетчеры сразу после коммита, не дожидаясь очередного опроса
+CREATE OR REPLACE FUNCTION notify_publish_outbox() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('publish_outbox', '');
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS publish_outbox_notify ON publish_outbox;
+CREATE TRIGGER publish_outbox_notify
+    AFTER INSERT ON publish_outbox
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_publish_outbox();
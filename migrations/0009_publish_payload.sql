@@ -0,0 +1,5 @@
+-- Поля опубликованного сообщения (автор, ярлык объёма, срок и т.д.) — чтобы
+-- перерисовывать его с актуальным свободным объёмом (editMessageText).
+-- Заполняется при публикации из outbox; у старых публикаций остаётся NULL — их не правим.
+
+ALTER TABLE assignments ADD COLUMN IF NOT EXISTS publish_payload jsonb;
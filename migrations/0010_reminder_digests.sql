@@ -0,0 +1,12 @@
+-- Последний дайджест напоминаний в каждой теме: id сообщений по частям,
+-- чтобы следующий тик правил или заменял их, а не слал новые рядом.
+-- thread_id = 0 — чат без темы.
+
+CREATE TABLE IF NOT EXISTS reminder_digests (
+    chat_id    bigint NOT NULL,
+    thread_id  bigint NOT NULL DEFAULT 0,
+    part       integer NOT NULL,
+    message_id bigint NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (chat_id, thread_id, part)
+);
@@ -0,0 +1,12 @@
+-- Расписание напоминаний по заданиям (REMIND_MODE=deadline): когда напомнить
+-- в следующий раз, сколько напоминаний подряд прошло без взятий и какой был
+-- свободный объём на последнем напоминании. NULL в next_remind_at — не запланировано.
+
+ALTER TABLE assignments ADD COLUMN IF NOT EXISTS next_remind_at timestamptz;
+ALTER TABLE assignments ADD COLUMN IF NOT EXISTS remind_count integer NOT NULL DEFAULT 0;
+ALTER TABLE assignments ADD COLUMN IF NOT EXISTS last_remind_free numeric;
+
+-- досинхронизация: открытые опубликованные задания, ещё не попавшие в расписание
+CREATE INDEX IF NOT EXISTS assignments_remind_unscheduled_idx
+    ON assignments (id)
+    WHERE is_active AND free_volume > 0 AND published_chat_id IS NOT NULL AND next_remind_at IS NULL;
@@ -0,0 +1,24 @@
+-- Изменение членства пользователя → NOTIFY users_membership_changed
+-- (payload — «user_id:1» / «user_id:0»; кэш AllowedUsers на всех репликах
+-- применяет изменение точечно). Строки без изменения is_member не уведомляют.
+
+CREATE OR REPLACE FUNCTION notify_users_membership_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('users_membership_changed', OLD.id || ':0');
+    ELSE
+        PERFORM pg_notify('users_membership_changed', NEW.id || ':' || NEW.is_member::int);
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_membership_changed_ins ON users;
+CREATE TRIGGER users_membership_changed_ins
+    AFTER INSERT OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_users_membership_changed();
+
+DROP TRIGGER IF EXISTS users_membership_changed_upd ON users;
+CREATE TRIGGER users_membership_changed_upd
+    AFTER UPDATE OF is_member ON users
+    FOR EACH ROW WHEN (OLD.is_member IS DISTINCT FROM NEW.is_member)
+    EXECUTE FUNCTION notify_users_membership_changed();
@@ -0,0 +1,9 @@
+-- Когда членство пользователя последний раз подтверждалось в Telegram (аудит).
+-- Хранится в БД, чтобы очерёдность «сначала давно не проверенные» переживала
+-- рестарт и смену лидера. NULL — ещё ни разу не проверялся.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS verified_at timestamptz;
+
+-- очередной шард аудита: ORDER BY verified_at NULLS FIRST, id LIMIT n
+CREATE INDEX IF NOT EXISTS users_verified_at_idx
+    ON users (verified_at ASC NULLS FIRST, id);
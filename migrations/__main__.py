@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+Применить недостающие миграции без запуска бота.
+Запускать из корня проекта:
+    python -m migrations
+или настройте в PyCharm "Module name": migrations
+"""
+import asyncio
+import sys
+
+from app.config import get_config
+from app.db.pool import init_pool, close_pool
+from app.db.migrate import apply_migrations
+
+
+async def _main() -> None:
+    await init_pool(get_config().db_dsn)
+    try:
+        applied = await apply_migrations()
+    finally:
+        await close_pool()
+    if applied:
+        for m in applied:
+            print(f"✅ {m.version:04d}_{m.name}")
+    else:
+        print("✅ БД в актуальном состоянии.")
+
+
+if __name__ == "__main__":
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(_main())